@@ -1,20 +1,214 @@
+import copy
+import os
+import typing
+
+import numpy as np
 import sklearn.cluster as sk
 
 from clustering.model.Algorithm import Algorithm
 from clustering.model.Algorithm import AlgoParams
 from clustering.model.Algorithm import SelectableParam
+from clustering.model.Algorithm import IncrementalFit
+from clustering.model.ArrayCache import ArrayCache, array_key
+from clustering.model.DistanceMatrix import condensed_distances, distances, radius_graph
+from clustering.model.Metric import Metric
+from clustering.metrics.default_metrics import get_metric
+
+if typing.TYPE_CHECKING:
+    import scipy.sparse
+
+_merge_trees = ArrayCache(os.path.join('cache', 'merge_trees'), memory_size=64 * 2 ** 20)
+_neighbour_graphs = ArrayCache(os.path.join('cache', 'neighbour_graphs'), memory_size=256 * 2 ** 20)
+
+
+def _fit_k_means(data: np.ndarray, params: dict, previous: sk.KMeans) -> (np.ndarray, sk.KMeans):
+    params = dict(params)
+    n_clusters = params.get('n_clusters', 8)
+    # Rerun starts from the previous centers, if the number of clusters is the same
+    if previous is not None and previous.cluster_centers_.shape == (n_clusters, data.shape[1]):
+        params.update(init=previous.cluster_centers_, n_init=1)
+    estimator = sk.KMeans(**params).fit(data)
+    return estimator.labels_, estimator
+
+
+def _fit_birch(data: np.ndarray, params: dict, previous: sk.Birch) -> (np.ndarray, sk.Birch):
+    estimator = sk.Birch(**params)
+    # CF-tree doesn't depend on n_clusters, so if only n_clusters is changed, its subclusters are just clustered again
+    if previous is not None and previous.get_params() == dict(estimator.get_params(),
+                                                              n_clusters=previous.n_clusters):
+        estimator = copy.deepcopy(previous)
+        estimator.set_params(n_clusters=params.get('n_clusters', 3)).partial_fit()
+        return estimator.predict(data), estimator
+    estimator.fit(data)
+    return estimator.labels_, estimator
+
+
+def _merge_tree(data: np.ndarray, affinity: str, linkage: str) -> dict:
+    # Ward and single linkages are built from features (single one by minimum spanning tree without the whole
+    # matrix), others need all pairwise distances, so the stored matrix is used for them
+    matrix = None if linkage in ('ward', 'single') else distances.get(data, get_metric(affinity))
+    if matrix is not None:
+        from scipy.cluster import hierarchy
+        # sklearn does the same for precomputed distances, but it condenses them with indices of the whole triangle
+        tree = hierarchy.linkage(condensed_distances(matrix), method=linkage)
+        return {'children': tree[:, :2].astype(np.intp), 'distances': tree[:, 2]}
+    clustering = sk.AgglomerativeClustering(n_clusters=None, distance_threshold=0, compute_full_tree=True,
+                                            affinity=affinity, linkage=linkage).fit(data)
+    return {'children': clustering.children_, 'distances': clustering.distances_}
+
+
+def _cut_merge_tree(children: np.ndarray, n_clusters: int) -> np.ndarray:
+    """
+    :return: labels of points after the first (n_samples - n_clusters) merges
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    n_samples = children.shape[0] + 1
+    n_merges = n_samples - n_clusters
+    # Each merged node is connected with the new node, so the clusters are connected components
+    parents = np.repeat(np.arange(n_samples, n_samples + n_merges), 2)
+    graph = coo_matrix((np.ones(2 * n_merges), (children[:n_merges].ravel(), parents)),
+                       shape=(n_samples + n_merges, n_samples + n_merges))
+    labels = connected_components(graph, directed=False)[1][:n_samples]
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def _agglomerative(data: np.ndarray, params: dict) -> np.ndarray:
+    """
+    Full merge tree is cached for each (data, affinity, linkage), so any number of clusters or distance threshold
+    is found by cutting it.
+    """
+    n_clusters, distance_threshold = params.get('n_clusters'), params.get('distance_threshold')
+    if n_clusters is not None and distance_threshold is not None:
+        raise ValueError("Exactly one of n_clusters and distance_threshold has to be set, and the other needs to "
+                         "be None.")
+    affinity, linkage = params.get('affinity', 'euclidean'), params.get('linkage', 'ward')
+    tree = _merge_trees.get(array_key(data, affinity, linkage), lambda: _merge_tree(data, affinity, linkage))
+    if distance_threshold is not None:
+        n_clusters = np.count_nonzero(tree['distances'] >= distance_threshold) + 1
+    elif n_clusters is None:
+        n_clusters = 2
+    if not 1 <= n_clusters <= data.shape[0]:
+        raise ValueError(f"n_clusters should be in [1, {data.shape[0]}], got {n_clusters}")
+    return _cut_merge_tree(tree['children'], n_clusters)
+
+
+def _neighbour_graph(data: np.ndarray, eps: float, params: dict, matrix: np.ndarray) -> dict:
+    """
+    :param matrix: stored distance matrix of data for the metric, or None
+    """
+    if matrix is not None:
+        graph = radius_graph(matrix, eps)
+    else:
+        from sklearn.neighbors import NearestNeighbors
+        nn_params = {name: params[name] for name in ('metric', 'p', 'algorithm', 'leaf_size', 'n_jobs')
+                     if params.get(name) is not None}
+        graph = NearestNeighbors(radius=eps, **nn_params).fit(data).radius_neighbors_graph(data, mode='distance')
+    return {'eps': np.array(eps), 'indptr': graph.indptr, 'indices': graph.indices, 'distances': graph.data}
+
+
+def _dbscan_labels(neighbours: 'scipy.sparse.csr_matrix', is_core: np.ndarray) -> np.ndarray:
+    """
+    Same labels as sklearn.cluster.DBSCAN for given neighbourhoods (each point is its own neighbour): cores are
+    connected through their neighbourhoods, clusters are numbered in order of their first core, and each border point
+    belongs to the first cluster (with the lowest label) among its neighbours.
+
+    :param neighbours: neighbourhoods of points, only neighbours, that are cores, are required
+    """
+    from scipy.sparse.csgraph import connected_components
+    n_samples = neighbours.shape[0]
+    labels = np.full(n_samples, -1)
+    core_idx = np.flatnonzero(is_core)
+    if len(core_idx) == 0:
+        return labels
+    components = connected_components(neighbours[core_idx][:, core_idx], directed=False)[1]
+    _, first, numbers = np.unique(components, return_index=True, return_inverse=True)
+    labels[core_idx] = np.argsort(np.argsort(first))[numbers]
+    rows = np.repeat(np.arange(n_samples), np.diff(neighbours.indptr))
+    border = ~is_core[rows] & is_core[neighbours.indices]
+    border_labels = np.full(n_samples, n_samples)
+    np.minimum.at(border_labels, rows[border], labels[neighbours.indices[border]])
+    labels[~is_core & (border_labels < n_samples)] = border_labels[~is_core & (border_labels < n_samples)]
+    return labels
+
+
+def _bounded_dbscan(data: np.ndarray, metric: Metric, eps: float, min_samples: int) -> np.ndarray:
+    """
+    DBSCAN by blocks of the distance matrix: cores are found by their nearest neighbours, then only neighbours,
+    that are cores, are kept. Memory doesn't depend on the number of noise and border points in neighbourhoods.
+    """
+    from scipy.sparse import csr_matrix
+    n_samples = data.shape[0]
+    if not 1 <= min_samples <= n_samples:
+        return np.full(n_samples, -1)
+    nearest_distances, _ = metric.nearest_k(data, min_samples)
+    is_core = nearest_distances[:, -1] <= eps
+    core_idx = np.flatnonzero(is_core)
+    core_neighbours = metric.radius_neighbours(data, eps, y=data[core_idx])
+    neighbours = csr_matrix((core_neighbours.data, core_idx[core_neighbours.indices], core_neighbours.indptr),
+                            shape=(n_samples, n_samples))
+    return _dbscan_labels(neighbours, is_core)
+
+
+def _dbscan(data: np.ndarray, params: dict) -> np.ndarray:
+    """
+    Radius-neighbour graph is cached for each (data, metric, p) with the largest eps requested so far, so runs
+    with smaller eps or another min_samples only filter it.
+    Brute force and cosine metric without stored distance matrix are done by `_bounded_dbscan` instead.
+    """
+    from scipy.sparse import csr_matrix
+    eps, min_samples = params.get('eps', 0.5), params.get('min_samples', 5)
+    metric = params.get('metric', 'euclidean')
+    key = array_key(data, metric, params.get('p'))
+    graph = _neighbour_graphs.load(key)
+    if graph is None or graph['eps'] < eps:
+        brute = params.get('algorithm') == 'brute'
+        matrix = None
+        # Minkowski metric depends on p, so the registered metric (with p=2) isn't used for it. Distance matrix is
+        # calculated only for brute force, trees find neighbours without it
+        if metric != 'minkowski':
+            matrix = distances.get(data, get_metric(metric)) if brute else distances.load(data, get_metric(metric))
+            if matrix is None and (brute or metric == 'cosine'):
+                return _bounded_dbscan(data, get_metric(metric), eps, min_samples)
+        graph = _neighbour_graph(data, eps, params, matrix)
+        _neighbour_graphs.store(key, graph)
+    n_samples = data.shape[0]
+    rows = np.repeat(np.arange(n_samples), np.diff(graph['indptr']))
+    inside = graph['distances'] <= eps
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[inside], minlength=n_samples))])
+    neighbours = csr_matrix((graph['distances'][inside], graph['indices'][inside], indptr),
+                            shape=(n_samples, n_samples))
+    return _dbscan_labels(neighbours, np.diff(neighbours.indptr) >= min_samples)
+
 
 k_means = Algorithm(name="K-means",
                     params=AlgoParams(
                         bool_params=[],
                         float_params=["tol"],
-                        int_params=["n_clusters", "n_init", "max_iter", "verbose"],
+                        int_params=["n_clusters", "n_init", "max_iter", "verbose", "random_state"],
                         selectable_params=[SelectableParam(name="algorithm",
                                                            items=["elkan", "auto", "full"])]
                     ),
                     run=lambda data, params:
                     sk.KMeans(**params)
-                    .fit(data).labels_)
+                    .fit(data).labels_,
+                    deterministic=False,
+                    fit=_fit_k_means)
+
+mini_batch_k_means = Algorithm(name="Mini-batch K-means",
+                               params=AlgoParams(
+                                   bool_params=[],
+                                   float_params=["tol", "reassignment_ratio"],
+                                   int_params=["n_clusters", "batch_size", "max_iter", "n_init", "random_state"],
+                                   selectable_params=[]
+                               ),
+                               run=lambda data, params:
+                               sk.MiniBatchKMeans(**params)
+                               .fit(data).labels_,
+                               deterministic=False,
+                               incremental=IncrementalFit(
+                                   create=lambda params: sk.MiniBatchKMeans(**params)
+                               ))
 
 agglomerative = Algorithm(name="Agglomerative clustering",
                           params=AlgoParams(
@@ -28,9 +222,7 @@ agglomerative = Algorithm(name="Agglomerative clustering",
                                                   items=["ward", "complete", "average", "single"])
                               ]
                           ),
-                          run=lambda data, params:
-                          sk.AgglomerativeClustering(**params)
-                          .fit(data).labels_)
+                          run=_agglomerative)
 
 dbscan = Algorithm(name="DBSCAN",
                    params=AlgoParams(
@@ -43,9 +235,7 @@ dbscan = Algorithm(name="DBSCAN",
                            SelectableParam(name="algorithm",
                                            items=["auto", "ball_tree", "kd_tree", "brute"])]
                    ),
-                   run=lambda data, params:
-                   sk.DBSCAN(**params)
-                   .fit(data).labels_)
+                   run=_dbscan)
 
 birch = Algorithm(name="BIRCH",
                   params=AlgoParams(
@@ -56,7 +246,27 @@ birch = Algorithm(name="BIRCH",
                   ),
                    run=lambda data, params:
                    sk.Birch(**params)
-                   .fit(data).labels_)
+                   .fit(data).labels_,
+                   # CF-tree is built on chunks, then its subclusters are clustered once
+                   incremental=IncrementalFit(
+                       create=lambda params: sk.Birch(**{**params, 'n_clusters': None}),
+                       finish=lambda birch, params: birch.set_params(n_clusters=params.get('n_clusters', 3))
+                       .partial_fit()
+                   ),
+                   fit=_fit_birch)
+
+def _affinity_propagation(data: np.ndarray, params: dict) -> np.ndarray:
+    """
+    Similarities of points (negative squared euclidean distances) are calculated from the stored distance matrix,
+    if there is one.
+    """
+    matrix = None
+    if params.get('affinity', 'euclidean') == 'euclidean':
+        matrix = distances.get(data, get_metric('euclidean'))
+    if matrix is not None:
+        data, params = -np.square(np.asarray(matrix), dtype=np.float64), dict(params, affinity='precomputed')
+    return sk.AffinityPropagation(**params).fit(data).labels_
+
 
 affinity = Algorithm(name="Affinity propagation",
                   params=AlgoParams(
@@ -66,8 +276,7 @@ affinity = Algorithm(name="Affinity propagation",
                        selectable_params=[SelectableParam(name="affinity",
                                                          items=["euclidean", "precomputed"]) ]
                    ),
-                   run=lambda data, params:
-                   sk.AffinityPropagation(**params)
-                   .fit(data).labels_)
+                   run=_affinity_propagation,
+                   deterministic=False)
 
-algorithms = [k_means, agglomerative, dbscan, birch, affinity]
+algorithms = [k_means, mini_batch_k_means, agglomerative, dbscan, birch, affinity]
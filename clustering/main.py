@@ -3,44 +3,58 @@ import sys
 
 from clustering.model.Algorithm import load_algorithms
 from clustering.model.Dataset import load_all_datasets
+from clustering.model.JobExecutor import ExecutorKind
 from clustering.model.Model import Model
+from clustering.model.ResultCache import ResultCache
 from clustering.view.SelectModeDialog import SelectModeDialog
 from clustering.view.View import View
 from clustering.presenter.Presenter import Presenter
 from clustering.scores.default_scores import scores
 
-app = QApplication(sys.argv)
-
-all_saved_algo_names = [algo.name for algo in load_algorithms()]
-if len(all_saved_algo_names) > len(set(all_saved_algo_names)):
-    print("Algorithms in clustering/algorithms are not distinct")
-    raise Exception
-
-all_saved_dataset_names = [dataset.name for dataset in load_all_datasets()]
-if len(all_saved_dataset_names) > len(set(all_saved_dataset_names)):
-    print("Datasets in clustering/datasets are not distinct")
-    raise Exception
-
-model = Model(
-    datasets=load_all_datasets(),
-    algorithms=load_algorithms(),
-    scores=scores
-)
-
-if not model.load_from_file():
-    dialog = SelectModeDialog()
-    if dialog.exec():
-        model.reload(dialog.get_result())
-    else:
-        exit(0)
-
-presenter = Presenter()
-presenter.set_model(model)
-
-view = View(presenter)
-presenter.set_view(view)
-
-view.load_from_model(presenter.model)
-view.show()
-sys.exit(app.exec())
 
+def main():
+    app = QApplication(sys.argv)
+
+    # Algorithm modules are not imported here, see `load_algorithms`
+    algorithms = load_algorithms()
+    all_saved_algo_names = [algo.name for algo in algorithms]
+    if len(all_saved_algo_names) > len(set(all_saved_algo_names)):
+        print("Algorithms in clustering/algorithms are not distinct")
+        raise Exception
+
+    # Datasets are loaded lazily, so only the records from json are read here
+    datasets = load_all_datasets()
+    all_saved_dataset_names = [dataset.name for dataset in datasets]
+    if len(all_saved_dataset_names) > len(set(all_saved_dataset_names)):
+        print("Datasets in clustering/datasets are not distinct")
+        raise Exception
+
+    model = Model(
+        datasets=datasets,
+        algorithms=algorithms,
+        scores=scores,
+        executor_kind=ExecutorKind.ThreadPool,
+        result_cache=ResultCache()
+    )
+
+    if not model.load_from_file():
+        dialog = SelectModeDialog()
+        if dialog.exec():
+            model.reload(dialog.get_result())
+        else:
+            exit(0)
+
+    presenter = Presenter()
+    presenter.set_model(model)
+
+    view = View(presenter)
+    presenter.set_view(view)
+
+    view.load_from_model(presenter.model)
+    view.show()
+    sys.exit(app.exec())
+
+
+# Worker processes of the compare mode import this module again, so the app is started only in the main process
+if __name__ == '__main__':
+    main()
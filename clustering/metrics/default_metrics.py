@@ -1,12 +1,26 @@
+from functools import partial
+
 import sklearn.metrics as sm
 
 from clustering.model.Metric import Metric
 
 
 metrics = [
-    Metric("Euclidean", sm._dist_metrics.EuclideanDistance),
-    Metric("Manhattan", sm._dist_metrics.ManhattanDistance),
-    Metric("Hamming", sm._dist_metrics.HammingDistance),
-    Metric("Jaccard", sm._dist_metrics.JaccardDistance),
-    Metric("Minkowski", sm._dist_metrics.MinkowskiDistance)
+    Metric("Euclidean", partial(sm.pairwise_distances, metric='euclidean'), aliases=['euclidean', 'l2']),
+    Metric("Manhattan", partial(sm.pairwise_distances, metric='manhattan'), aliases=['manhattan', 'l1', 'cityblock']),
+    Metric("Cosine", partial(sm.pairwise_distances, metric='cosine'), aliases=['cosine']),
+    Metric("Hamming", partial(sm.pairwise_distances, metric='hamming'), aliases=['hamming']),
+    Metric("Jaccard", partial(sm.pairwise_distances, metric='jaccard'), aliases=['jaccard']),
+    Metric("Minkowski", partial(sm.pairwise_distances, metric='minkowski'), aliases=['minkowski'])
 ]
+
+
+def get_metric(name: str) -> Metric:
+    """
+    :param name: name of the metric or one of its aliases
+    :raise KeyError: if there is no such metric
+    """
+    for metric in metrics:
+        if name == metric.name or name in metric.aliases:
+            return metric
+    raise KeyError(f"Unknown metric {name}")
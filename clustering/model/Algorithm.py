@@ -1,6 +1,7 @@
 from collections.abc import Callable
 import numpy as np
 import os
+import ast
 import importlib
 from dataclasses import dataclass
 
@@ -19,45 +20,188 @@ class AlgoParams:
     selectable_params: [SelectableParam]
 
 
+# Datasets larger than this (in bytes) are processed by chunks, if the algorithm supports it
+INCREMENTAL_DATA_SIZE = 256 * 2 ** 20
+# Number of rows, on which incremental algorithms are fitted at once
+INCREMENTAL_CHUNK_SIZE = 65536
+
+
+@dataclass
+class IncrementalFit:
+    """
+    Optional interface of algorithms, that can be fitted on data by chunks, so that the whole data is never loaded
+    in memory (e.g. when it is memory-mapped).
+
+    `create(params)` returns an estimator with methods `partial_fit(chunk)` and `predict(chunk)`.
+    `finish(estimator, params)` (if specified) is called after the estimator is fitted on all chunks, and before
+    the points are labelled by `predict`.
+    """
+    create: Callable[[dict], object]
+    finish: Callable[[object, dict], None] = None
+
+
 class Algorithm:
     """
     This class is used to represent an instance of clustering algorithm.
     """
 
-    def __init__(self, name: str, params: AlgoParams, run: Callable[[np.ndarray, dict], np.ndarray]):
+    def __init__(self, name: str, params: AlgoParams, run: Callable[[np.ndarray, dict], np.ndarray],
+                 deterministic: bool = True, incremental: IncrementalFit = None,
+                 fit: Callable[[np.ndarray, dict, object], (np.ndarray, object)] = None):
         """
         :param name: title for algorithm
         :param run: function that implements clustering. It should take exactly two arguments: 2d-array with data
         and the number of classes
+        :param deterministic: whether the result depends only on data and params. Results of nondeterministic
+        algorithms are cached only if `random_state` is specified
+        :param incremental: implementation of clustering by chunks, which is used for large datasets
+        :param fit: implementation of clustering, that also returns the fitted estimator. It takes data, params and
+        the estimator fitted by the previous run (or None), which may be used for warm start. It should return tuple
+        (labels, estimator)
+
+        If `run` is None, the algorithm is a placeholder found by `discover_algorithms_in_module`: its module is
+        imported on the first run.
         """
         self.name = name
         self.params = params
+        self.deterministic = deterministic
+        self.module = None
         self.__run = run
+        self.__incremental = incremental
+        self.__fit = fit
+        self.__implementation = None if run is None else self
+
+    def _implementation(self) -> 'Algorithm':
+        if self.__implementation is None:
+            self.__implementation = _find_algorithm(self.module, self.name)
+        return self.__implementation
 
     # Can't pass Dataset here, because it may contain target
     def run(self, data: np.ndarray, params: dict) -> np.ndarray:
-        return self.__run(data, params)
+        return self._implementation().__run(data, params)
+
+    def fit(self, data: np.ndarray, params: dict, previous=None) -> (np.ndarray, object):
+        """
+        Same as `run`, but also returns the fitted estimator (or None, if the algorithm doesn't provide it).
+
+        :param previous: estimator returned by the previous run of this algorithm on the same data
+        """
+        implementation = self._implementation()
+        if implementation.__fit is None:
+            return implementation.__run(data, params), None
+        return implementation.__fit(data, params, previous)
+
+    def is_incremental(self) -> bool:
+        return self._implementation().__incremental is not None
+
+    def run_incremental(self, data: np.ndarray, params: dict, chunk_size: int = INCREMENTAL_CHUNK_SIZE) -> np.ndarray:
+        """
+        Same as `run`, but the estimator is fitted on chunks of data, and then the chunks are labelled one by one.
+        Only one chunk is loaded in memory at a time, if data is memory-mapped.
+        """
+        incremental = self._implementation().__incremental
+        estimator = incremental.create(params)
+        for start in range(0, len(data), chunk_size):
+            estimator.partial_fit(np.asarray(data[start:start + chunk_size]))
+        if incremental.finish is not None:
+            incremental.finish(estimator, params)
+        return np.concatenate([estimator.predict(np.asarray(data[start:start + chunk_size]))
+                               for start in range(0, len(data), chunk_size)])
+
+    def __reduce__(self):
+        # `run` is usually a lambda, which can't be pickled, so the algorithm is imported again by its module and name
+        # (e.g. when it is sent to a process pool)
+        if self.module is None:
+            return super().__reduce__()
+        return _find_algorithm, (self.module, self.name)
+
+
+def _find_algorithm(module: str, name: str) -> Algorithm:
+    return next(algo for algo in load_algorithms_from_module(module) if algo.name == name)
 
 
 def load_algorithms_from_module(file: str) -> [Algorithm]:
-    lib = importlib.import_module('clustering.algorithms.' + os.path.splitext(os.path.basename(file))[0])
+    module = os.path.splitext(os.path.basename(file))[0]
+    lib = importlib.import_module('clustering.algorithms.' + module)
+    for algorithm in lib.algorithms:
+        algorithm.module = module
     return lib.algorithms
 
 
+_literal_classes = {cls.__name__: cls for cls in (AlgoParams, SelectableParam)}
+
+
+def _eval_literal(node: ast.expr):
+    """
+    Evaluates literal, that may contain calls of AlgoParams and SelectableParam.
+    """
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _literal_classes:
+        return _literal_classes[node.func.id](*[_eval_literal(arg) for arg in node.args],
+                                              **{kw.arg: _eval_literal(kw.value) for kw in node.keywords})
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_eval_literal(elt) for elt in node.elts]
+    return ast.literal_eval(node)
+
+
+def _algorithm_placeholder(call: ast.Call, module: str) -> Algorithm:
+    args = dict(zip(['name', 'params'], call.args))
+    args.update({kw.arg: kw.value for kw in call.keywords})
+    algorithm = Algorithm(name=_eval_literal(args['name']),
+                          params=_eval_literal(args['params']),
+                          run=None,
+                          deterministic=_eval_literal(args['deterministic']) if 'deterministic' in args else True)
+    algorithm.module = module
+    return algorithm
+
+
+def discover_algorithms_in_module(file: str) -> [Algorithm]:
+    """
+    Finds algorithms in the file without importing it. This works if each algorithm is assigned to a global variable
+    as `Algorithm(...)` with literal name and params, and `algorithms` is a literal list of these variables.
+
+    :return: placeholders for the algorithms, the module is imported when one of them is launched
+    :raise ValueError: if the algorithms can't be found this way
+    """
+    module = os.path.splitext(os.path.basename(file))[0]
+    with open(os.path.join('algorithms', module + '.py'), 'r') as source:
+        tree = ast.parse(source.read())
+    placeholders = {}
+    names = None
+    try:
+        for node in tree.body:
+            if not isinstance(node, ast.Assign) or len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
+                continue
+            var = node.targets[0].id
+            if var == 'algorithms':
+                names = [elt.id for elt in node.value.elts]
+            elif isinstance(node.value, ast.Call) and getattr(node.value.func, 'id', None) == 'Algorithm':
+                placeholders[var] = _algorithm_placeholder(node.value, module)
+        if names is None:
+            raise ValueError(f"Could not find algorithms variable in file {file}")
+        return [placeholders[name] for name in names]
+    except (AttributeError, KeyError, TypeError) as err:
+        raise ValueError(f"Could not discover algorithms in file {file}: {err}")
+
+
 def load_algorithms() -> [Algorithm]:
     """
     This function scans all python files in ./algorithms folder.
     Each file should contain a global variable `algorithms` containing an Iterable of Algorithm with all algorithms
     defined in the file.
+    Files are not imported, if algorithms can be discovered by `discover_algorithms_in_module`.
 
     :return: list with all algorithms extracted from those `algorithms` variables
     """
     res = []
-    files = filter(lambda it: os.path.isfile(os.path.join('algorithms', it)), os.listdir('algorithms'))
+    files = filter(lambda it: os.path.isfile(os.path.join('algorithms', it)) and it.endswith('.py'),
+                   os.listdir('algorithms'))
     for file in files:
         try:
-            res.extend(load_algorithms_from_module(file))
-        except AttributeError:
-            print(f"Could not find algorithms variable in file {file}, skipping")
+            res.extend(discover_algorithms_in_module(file))
+        except (SyntaxError, ValueError):
+            try:
+                res.extend(load_algorithms_from_module(file))
+            except AttributeError:
+                print(f"Could not find algorithms variable in file {file}, skipping")
 
     return res
@@ -0,0 +1,140 @@
+from collections.abc import Callable, Iterator
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+
+
+def array_key(data: np.ndarray, *params) -> str:
+    """
+    :return: key identifying the content of the array and params, under which intermediate results computed for
+    this array are stored
+    """
+    data = np.ascontiguousarray(data)
+    hasher = hashlib.sha256()
+    hasher.update(f"{data.dtype.str}{data.shape}".encode())
+    hasher.update(memoryview(data).cast('B'))
+    hasher.update(json.dumps(params, default=str).encode())
+    return hasher.hexdigest()
+
+
+def evict_least_recently_used(directory: str, suffix: str, max_size: int):
+    """
+    Removes least recently modified files with given suffix from the directory, until their total size is at most
+    `max_size` bytes (files are touched, when they are used).
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix):
+            try:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                pass
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+@contextmanager
+def atomic_write(filename: str) -> Iterator[str]:
+    """
+    Yields name of a temporary file in the same directory, which replaces `filename` after the block is finished
+    without errors (otherwise it is removed).
+    """
+    # Replacement is atomic, so that concurrent readers never see partially written file
+    tmp_filename = os.path.join(os.path.dirname(filename), f".{uuid.uuid4()}.tmp")
+    try:
+        yield tmp_filename
+        os.replace(tmp_filename, filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+class ArrayCache:
+    """
+    This class is used to store expensive results on disk, so that they can be reused by the following runs
+    (e.g. merge tree of agglomerative clustering, which is the same for any number of clusters).
+
+    Each result is a dict of arrays stored in a separate npz-file named after its key, so it is shared by all worker
+    processes. When total size of the files exceeds `max_size` bytes, least recently used results are removed.
+    Besides that, recently used results (up to `memory_size` bytes) are kept in memory of the process.
+    """
+
+    def __init__(self, directory: str, max_size: int = 512 * 2 ** 20, memory_size: int = 0):
+        self.directory = directory
+        self.max_size = max_size
+        self.memory_size = memory_size
+        self.__memory: OrderedDict[str, dict] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        """
+        Cache is sent to worker processes with the runs, the lock can't be pickled and results kept in memory
+        shouldn't be copied, so they are left out.
+        """
+        return {'directory': self.directory, 'max_size': self.max_size, 'memory_size': self.memory_size}
+
+    def __setstate__(self, state: dict):
+        self.__init__(state['directory'], state['max_size'], state['memory_size'])
+
+    def __filename(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key: str):
+        """
+        :return: dict of arrays or None, if there is no result with this key
+        """
+        with self.__lock:
+            if key in self.__memory:
+                self.__memory.move_to_end(key)
+                return self.__memory[key]
+        filename = self.__filename(key)
+        try:
+            with np.load(filename) as file:
+                result = {name: file[name] for name in file.files}
+            os.utime(filename)
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return None
+        self.__remember(key, result)
+        return result
+
+    def __remember(self, key: str, arrays: dict):
+        if self.memory_size <= 0:
+            return
+        with self.__lock:
+            self.__memory[key] = arrays
+            self.__memory.move_to_end(key)
+            total_size = sum(array.nbytes for result in self.__memory.values() for array in result.values())
+            while total_size > self.memory_size and self.__memory:
+                _, removed = self.__memory.popitem(last=False)
+                total_size -= sum(array.nbytes for array in removed.values())
+
+    def store(self, key: str, arrays: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_write(self.__filename(key)) as tmp_filename, open(tmp_filename, 'wb') as file:
+            np.savez(file, **arrays)
+        self.__remember(key, arrays)
+        evict_least_recently_used(self.directory, '.npz', self.max_size)
+
+    def get(self, key: str, calc: Callable[[], dict]) -> dict:
+        """
+        :return: result stored with this key, or the result of `calc`, which is stored for the following calls
+        """
+        result = self.load(key)
+        if result is None:
+            result = calc()
+            self.store(key, result)
+        return result
@@ -1,10 +1,16 @@
-from sklearn import preprocessing
+from collections.abc import Iterator
 import numpy as np
-import pandas
 import os
 import json
+import shutil
+import hashlib
+import typing
 
-from sklearn.datasets import make_blobs
+from clustering.model.ArrayCache import atomic_write
+
+# pandas and sklearn are imported in functions, that use them, because they take long to import on startup
+if typing.TYPE_CHECKING:
+    import pandas
 
 
 class Dataset:
@@ -37,7 +43,7 @@ class Dataset:
         self.titles = titles
 
         if target is not None:
-            self.num_of_classes = len(set(target))
+            self.num_of_classes = len(np.unique(target))
 
         if feature_names is None:
             feature_names = [f"Feature {i}" for i in range(1, data.shape[1] + 1)]
@@ -45,32 +51,258 @@ class Dataset:
 
         if titles is None:
             self.titles = np.array([f"Point #{i}" for i in range(data.shape[0])])
+        self._content_hash = None
+
+    @property
+    def shape(self) -> (int, int):
+        return self.data.shape
+
+    def release(self):
+        """
+        Frees memory used by arrays of the dataset, if they can be loaded again.
+        """
+        pass
+
+    def content_hash(self) -> str:
+        """
+        :return: hash of data and target, which is used to identify results calculated for this dataset
+        """
+        if self._content_hash is None:
+            hasher = hashlib.sha256()
+            for arr in (self.data, self.target):
+                if arr is not None:
+                    arr = np.ascontiguousarray(arr)
+                    hasher.update(f"{arr.dtype.str}{arr.shape}".encode())
+                    hasher.update(memoryview(arr).cast('B'))
+            self._content_hash = hasher.hexdigest()
+        return self._content_hash
 
     def __str__(self):
         return f"data = {self.data}\nfeature_names = {self.feature_names}\n" \
                f"target = {self.target}\nnum_of_classes = {self.num_of_classes},\nname = {self.name}"
 
 
+class StoredDataset(Dataset):
+    """
+    Dataset from the library (see `load_all_datasets()`). It is created from the record in json, and its arrays
+    are loaded from npy-files only on first access.
+    """
+
+    def __init__(self, name: str, shape: (int, int), num_of_classes: int, feature_names: [str],
+                 has_target: bool, content_hash: str = None):
+        self.name = name
+        self.num_of_classes = num_of_classes
+        self.feature_names = feature_names
+        self.has_target = has_target
+        self._shape = tuple(shape)
+        self._content_hash = content_hash
+        self._data = self._target = self._titles = None
+
+    def __getstate__(self):
+        # Arrays are loaded again after unpickling (e.g. in another process)
+        state = self.__dict__.copy()
+        state['_data'] = state['_target'] = state['_titles'] = None
+        return state
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._data is None:
+            self._data = np.load(os.path.join(_dataset_dir(self.name), _data_file), mmap_mode='r')
+        return self._data
+
+    @property
+    def target(self) -> np.ndarray:
+        if self._target is None and self.has_target:
+            self._target = np.load(os.path.join(_dataset_dir(self.name), _target_file), mmap_mode='r')
+        return self._target
+
+    @property
+    def titles(self) -> np.ndarray:
+        if self._titles is None:
+            self._titles = np.load(os.path.join(_dataset_dir(self.name), _titles_file), mmap_mode='r')
+        return self._titles
+
+    @property
+    def shape(self) -> (int, int):
+        return self._shape
+
+    def release(self):
+        self._data = self._target = self._titles = None
+
+
 class DuplicatedDatasetNameError(Exception):
     pass
 
 
 _json_file = os.path.join('datasets', 'datasets.json')
 
+# Each dataset is stored in its own directory as npy-files, so that arrays could be memory-mapped
+_data_file = 'data.npy'
+_target_file = 'target.npy'
+_titles_file = 'titles.npy'
+
+
+def _dataset_dir(name: str) -> str:
+    return os.path.join('datasets', name)
+
 
 def _dataset_filename(name: str) -> str:
+    # Datasets were stored in csv-files before, these files are migrated on the first launch
     return os.path.join('datasets', name + '.csv')
 
 
+def _projection_file(method: str) -> str:
+    return f'projection_{method}.npy'
+
+
+def load_projection(dataset: Dataset, method: str):
+    """
+    :return: 2d-projection of the dataset saved by `save_projection`, or None if there is no such projection
+    """
+    file = os.path.join(_dataset_dir(dataset.name), _projection_file(method))
+    try:
+        points = np.load(file)
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+    return points if points.shape == (dataset.shape[0], 2) else None
+
+
+def save_projection(dataset: Dataset, method: str, points: np.ndarray):
+    """
+    Saves 2d-projection next to the files of the dataset. Nothing is saved, if the dataset is not in the library.
+    """
+    directory = _dataset_dir(dataset.name)
+    if not os.path.isdir(directory):
+        return
+    with atomic_write(os.path.join(directory, _projection_file(method))) as tmp_file, open(tmp_file, 'wb') as file:
+        np.save(file, points)
+
+
 def normalise_dataset(data: np.ndarray) -> np.ndarray:
+    from sklearn import preprocessing
     return preprocessing.MinMaxScaler().fit_transform(data)
 
 
-def load_from_csv(file_name: str) -> pandas.DataFrame:
+def load_from_csv(file_name: str) -> 'pandas.DataFrame':
+    import pandas
     return pandas.read_csv(file_name)
 
 
-def get_cols_with_type(df: pandas.DataFrame, types: [str]) -> pandas.DataFrame:
+# Number of rows, that are converted to csv at once
+CSV_CHUNK_SIZE = 100000
+
+
+def write_csv_chunks(file_name: str, header: [str], columns: [np.ndarray],
+                     chunk_size: int = CSV_CHUNK_SIZE) -> Iterator[int]:
+    """
+    Writes columns to csv-file by chunks of rows, so that only one chunk is converted to text at a time.
+    Each column is either 1d-array or 2d-array, whose columns are written one after another; numeric columns
+    keep their dtypes.
+
+    :return: iterator, that writes the next chunk on each step and yields the number of rows written so far
+    """
+    import pandas
+    n_rows = len(columns[0])
+    with open(file_name, 'w', newline='') as file:
+        for start in range(0, max(n_rows, 1), chunk_size):
+            stop = min(start + chunk_size, n_rows)
+            chunk = {}
+            for column in columns:
+                values = np.asarray(column[start:stop])
+                for values_column in (values.T if values.ndim == 2 else [values]):
+                    chunk[len(chunk)] = values_column
+            df = pandas.DataFrame(chunk)
+            df.columns = header
+            df.to_csv(file, header=start == 0, index=False)
+            yield stop
+
+
+# Number of rows, from which types of columns are inferred
+CSV_SAMPLE_ROWS = 10000
+
+
+def load_csv_sample(file_name: str) -> 'pandas.DataFrame':
+    """
+    :return: first CSV_SAMPLE_ROWS rows of the csv-file, which are enough to find out its columns and their types
+    """
+    import pandas
+    return pandas.read_csv(file_name, nrows=CSV_SAMPLE_ROWS)
+
+
+def _read_csv_chunks(file_name: str, feature_cols: [str], title_col: str = None):
+    import pandas
+    cols = feature_cols + ([] if title_col is None else [title_col])
+    dtypes = {col: np.float64 for col in feature_cols}
+    if title_col is not None:
+        dtypes[title_col] = str
+    return pandas.read_csv(file_name, usecols=cols, dtype=dtypes, chunksize=CSV_CHUNK_SIZE)
+
+
+def import_from_csv(file_name: str, name: str, feature_cols: [str], title_col: str = None,
+                    normalise: bool = False) -> Dataset:
+    """
+    Adds dataset from the csv-file to the library (like `add_dataset`), without loading the whole file in memory.
+    The file is read by chunks twice: first to find its size (and range of each feature for normalisation),
+    then to write the chunks right into the npy-files of the dataset.
+
+    :raise DuplicatedDatasetNameError: if dataset with this name already exists
+    :raise ValueError: if some value of the feature columns is not a number
+    """
+    dump = _read_from_json()
+    if name in [d['name'] for d in dump]:
+        raise DuplicatedDatasetNameError()
+
+    n_rows, title_len = 0, 1
+    mins = np.full(len(feature_cols), np.inf)
+    maxs = np.full(len(feature_cols), -np.inf)
+    for chunk in _read_csv_chunks(file_name, feature_cols, title_col):
+        values = chunk[feature_cols].to_numpy(dtype=np.float64)
+        if len(values):
+            # NaN are ignored, like in `normalise_dataset`
+            mins = np.fmin(mins, np.fmin.reduce(values, axis=0))
+            maxs = np.fmax(maxs, np.fmax.reduce(values, axis=0))
+        if title_col is not None and len(chunk):
+            title_len = max(title_len, int(chunk[title_col].astype(str).str.len().max()))
+        n_rows += len(chunk)
+    if title_col is None:
+        title_len = len(f"Point #{max(n_rows - 1, 0)}")
+    scale = maxs - mins
+    scale[~(scale > 0)] = 1
+
+    directory = _dataset_dir(name)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        from numpy.lib.format import open_memmap
+        data = open_memmap(os.path.join(directory, _data_file), mode='w+', dtype=np.float64,
+                           shape=(n_rows, len(feature_cols)))
+        titles = open_memmap(os.path.join(directory, _titles_file), mode='w+', dtype=f'<U{title_len}',
+                             shape=(n_rows,))
+        start = 0
+        for chunk in _read_csv_chunks(file_name, feature_cols, title_col):
+            stop = start + len(chunk)
+            values = chunk[feature_cols].to_numpy(dtype=np.float64)
+            data[start:stop] = (values - mins) / scale if normalise else values
+            titles[start:stop] = np.array([f"Point #{i}" for i in range(start, stop)]) if title_col is None \
+                else chunk[title_col].astype(str).to_numpy()
+            start = stop
+        data.flush()
+        titles.flush()
+        del data, titles
+    except BaseException:
+        shutil.rmtree(directory)
+        raise
+
+    dataset = StoredDataset(name=name,
+                            shape=(n_rows, len(feature_cols)),
+                            num_of_classes=None,
+                            feature_names=list(feature_cols),
+                            has_target=False)
+    dump.append(_serialize_dataset(dataset))
+    _write_to_json(dump)
+    return dataset
+
+
+def get_cols_with_type(df: 'pandas.DataFrame', types: [str]) -> 'pandas.DataFrame':
     groups = df.columns.to_series().groupby(df.dtypes).groups
     groups = {str(k): list(v) for k, v in groups.items()}
     cols = []
@@ -79,39 +311,89 @@ def get_cols_with_type(df: pandas.DataFrame, types: [str]) -> pandas.DataFrame:
     return df[cols]
 
 
-def get_feature_cols(df: pandas.DataFrame) -> pandas.DataFrame:
+def get_feature_cols(df: 'pandas.DataFrame') -> 'pandas.DataFrame':
     return get_cols_with_type(df, ['int64', 'float64'])
 
 
-def _save_to_csv(data: Dataset, file_name: str = None):
-    if file_name is None:
-        file_name = _dataset_filename(data.name)
-    all_data = np.append(data.data, data.titles[np.newaxis].T, 1)
-    df = pandas.DataFrame(data=all_data, columns=data.feature_names + ['__Title__'])
-    df.to_csv(file_name, index=False)
+def _save_to_npy(dataset: Dataset):
+    directory = _dataset_dir(dataset.name)
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, _data_file), np.asarray(dataset.data, dtype=np.float64))
+    if dataset.target is not None:
+        np.save(os.path.join(directory, _target_file), np.asarray(dataset.target, dtype=np.int64))
+    np.save(os.path.join(directory, _titles_file), np.asarray(dataset.titles).astype(str))
 
 
 def _serialize_dataset(dataset: Dataset) -> dict:
     return {
         'name': dataset.name,
         'num_of_classes': dataset.num_of_classes,
-        'target': None if dataset.target is None else list(map(int, dataset.target))
+        'feature_names': list(dataset.feature_names),
+        'shape': list(dataset.shape),
+        'has_target': dataset.target is not None,
+        'hash': dataset.content_hash(),
+        'format': 'npy'
     }
 
 
 def _deserialize_dataset(dataset: dict) -> Dataset:
+    return StoredDataset(name=dataset['name'],
+                         shape=dataset['shape'],
+                         num_of_classes=dataset['num_of_classes'],
+                         feature_names=dataset['feature_names'],
+                         has_target=dataset['has_target'],
+                         content_hash=dataset.get('hash'))
+
+
+def _complete_metadata(dataset: dict) -> bool:
+    """
+    Adds to the record in json the fields, which were not stored by earlier versions.
+
+    :return: whether the record was changed
+    """
+    if 'shape' in dataset and 'has_target' in dataset:
+        return False
+    directory = _dataset_dir(dataset['name'])
+    # Only header of npy-file is read here
+    dataset['shape'] = list(np.load(os.path.join(directory, _data_file), mmap_mode='r').shape)
+    dataset['has_target'] = os.path.exists(os.path.join(directory, _target_file))
+    return True
+
+
+def _migrate_from_csv(dataset: dict) -> dict:
+    """
+    Copies dataset stored in csv-file (and target stored in json) to npy-files.
+
+    :return: new record for json
+    """
     name = dataset['name']
-    num_of_classes = dataset['num_of_classes']
-    target = None if dataset['target'] is None else np.array(dataset['target'])
     df = load_from_csv(_dataset_filename(name))
+    feature_cols = get_feature_cols(df)
     titles = df['__Title__'].to_numpy() if '__Title__' in df.columns.tolist() else None
-    data = get_feature_cols(df).to_numpy()
-    return Dataset(data,
-                   num_of_classes=num_of_classes,
-                   target=target,
-                   feature_names=get_feature_cols(df).columns.tolist(),
-                   name=name,
-                   titles=titles)
+    migrated = Dataset(feature_cols.to_numpy(),
+                       num_of_classes=dataset['num_of_classes'],
+                       target=None if dataset['target'] is None else np.array(dataset['target']),
+                       feature_names=feature_cols.columns.tolist(),
+                       name=name,
+                       titles=titles)
+    _save_to_npy(migrated)
+    return _serialize_dataset(migrated)
+
+
+def _migrate_all_from_csv():
+    dump = _read_from_json()
+    for ind, dataset in enumerate(dump):
+        if dataset.get('format') != 'npy' and os.path.exists(_dataset_filename(dataset['name'])):
+            dump[ind] = _migrate_from_csv(dataset)
+            # csv-file is kept (it may be tracked by git), it is removed together with the dataset
+            _write_to_json(dump)
+
+
+def _remove_dataset_files(name: str):
+    if os.path.exists(_dataset_filename(name)):
+        os.remove(_dataset_filename(name))
+    if os.path.isdir(_dataset_dir(name)):
+        shutil.rmtree(_dataset_dir(name))
 
 
 def _write_to_json(datasets: [dict]):
@@ -126,16 +408,16 @@ def _read_from_json() -> [dict]:
 
 def add_dataset(dataset: Dataset):
     """
-    The function creates a csv-file with dataset and record in json, so that this dataset will be included in
+    The function creates npy-files with dataset and record in json, so that this dataset will be included in
     `load_all_datasets()` during the next launch.
     Should be called each time you want a dataset to be saved
     """
-    _save_to_csv(dataset)
     dump = _read_from_json()
     if dump is None:
         dump = []
     if dataset.name in [d['name'] for d in dump]:
         raise DuplicatedDatasetNameError()
+    _save_to_npy(dataset)
     dump.append(_serialize_dataset(dataset))
     _write_to_json(dump)
 
@@ -146,25 +428,36 @@ def delete_dataset(name: str):
     during next launch.
     """
     dump = _read_from_json()
-    if os.path.exists(_dataset_filename(name)):
-        os.remove(_dataset_filename(name))
+    _remove_dataset_files(name)
     dump = list(filter(lambda d: d['name'] != name, dump))
     _write_to_json(dump)
 
 
 def load_all_datasets() -> [Dataset]:
     """
-    :return: list of all datasets, information about which is stored in json and corresponding csv-files.
+    :return: list of all datasets, information about which is stored in json. Arrays of the datasets are not
+    loaded until they are accessed, see `StoredDataset`.
+    Datasets that are still stored in csv-files are migrated to npy-files first.
     """
+    _migrate_all_from_csv()
     result = []
-    for dataset in _read_from_json():
+    dump = _read_from_json()
+    changed = False
+    for dataset in dump:
         try:
+            changed = _complete_metadata(dataset) or changed
             result.append(_deserialize_dataset(dataset))
-        except FileNotFoundError:
+        except (FileNotFoundError, KeyError):
+            result.append(None)
+    if changed:
+        _write_to_json(dump)
+    for dataset, loaded in zip(dump, result):
+        if loaded is None:
             delete_dataset(dataset['name'])
-    return result
+    return [dataset for dataset in result if dataset is not None]
 
 
 def generate_random_dataset(name: str, n_samples: int, num_of_classes: int, n_features: int, cluster_std: float) -> Dataset:
+    from sklearn.datasets import make_blobs
     data, ans = make_blobs(n_samples=n_samples, centers=num_of_classes, n_features=n_features, cluster_std=cluster_std)
     return Dataset(data=data, num_of_classes=num_of_classes, target=ans, name=name)
@@ -0,0 +1,129 @@
+import os
+import typing
+
+import numpy as np
+
+from clustering.model.ArrayCache import array_key, atomic_write, evict_least_recently_used
+from clustering.model.Metric import Metric
+
+if typing.TYPE_CHECKING:
+    import scipy.sparse
+
+# Distance matrices of smaller datasets are cheap to calculate, so they are not stored
+DISTANCE_MIN_SAMPLES = 2000
+# Largest stored matrix in bytes (float32 matrix of about 32k points)
+DISTANCE_MAX_MATRIX_SIZE = 4 * 2 ** 30
+# Stored matrix is read by blocks of rows, each of them takes about this number of bytes
+DISTANCE_BLOCK_SIZE = 64 * 2 ** 20
+
+
+def calc_distances(data: np.ndarray, metric: Metric, out: np.ndarray):
+    """
+    Calculates pairwise distances between points of the dataset into `out` (array with shape (n, n)).
+    Blocks of rows are calculated by threads of the metric, each block is written right after it is calculated.
+    """
+    def write_block(block: np.ndarray, start: int):
+        # Distance of point to itself may be calculated with rounding error, but algorithms expect exact zero
+        rows = np.arange(block.shape[0])
+        block[rows, start + rows] = 0
+        out[start:start + block.shape[0]] = block
+
+    metric.reduce_rows(data, write_block)
+
+
+def radius_graph(matrix: np.ndarray, radius: float) -> 'scipy.sparse.csr_matrix':
+    """
+    :param matrix: matrix of pairwise distances (e.g. memory-mapped), it is read by blocks of rows
+    :return: sparse matrix with distances between points not further than radius from each other
+    """
+    from scipy.sparse import csr_matrix
+    n_samples = matrix.shape[0]
+    block_rows = max(1, DISTANCE_BLOCK_SIZE // (matrix.itemsize * n_samples))
+    counts, indices, values = [], [], []
+    for start in range(0, n_samples, block_rows):
+        block = np.asarray(matrix[start:start + block_rows])
+        inside = block <= radius
+        counts.append(np.count_nonzero(inside, axis=1))
+        indices.append(np.nonzero(inside)[1])
+        values.append(block[inside].astype(np.float64))
+    indptr = np.concatenate([[0], np.cumsum(np.concatenate(counts))])
+    return csr_matrix((np.concatenate(values), np.concatenate(indices), indptr), shape=(n_samples, n_samples))
+
+
+def condensed_distances(matrix: np.ndarray) -> np.ndarray:
+    """
+    :param matrix: symmetric matrix of pairwise distances (e.g. memory-mapped)
+    :return: its upper triangle in float64, as scipy expects condensed distances. It is copied row by row, so that
+    indices of the whole triangle are never created
+    """
+    n_samples = matrix.shape[0]
+    condensed = np.empty(n_samples * (n_samples - 1) // 2)
+    start = 0
+    for row in range(n_samples - 1):
+        condensed[start:start + n_samples - row - 1] = matrix[row, row + 1:]
+        start += n_samples - row - 1
+    return condensed
+
+
+class DistanceCache:
+    """
+    This class is used to calculate pairwise distances of a dataset once for all algorithms and scores, that need
+    them (they get the matrix as precomputed input).
+
+    Each matrix is stored as float32 npy-file named after (data, metric) and opened memory-mapped, so it isn't
+    loaded into memory. The files are shared and evicted like those of `ArrayCache`.
+    """
+
+    def __init__(self, directory: str, max_size: int = 16 * 2 ** 30):
+        self.directory = directory
+        self.max_size = max_size
+
+    @staticmethod
+    def is_stored(n_samples: int) -> bool:
+        """
+        :return: whether distance matrix of dataset with this number of points is stored
+        """
+        return DISTANCE_MIN_SAMPLES <= n_samples and 4 * n_samples ** 2 <= DISTANCE_MAX_MATRIX_SIZE
+
+    def __filename(self, data: np.ndarray, metric: Metric) -> str:
+        return os.path.join(self.directory, array_key(data, metric.name) + '.npy')
+
+    def load(self, data: np.ndarray, metric: Metric):
+        """
+        :return: read-only memory-mapped matrix of distances between points of data, or None if it isn't stored
+        """
+        if not self.is_stored(data.shape[0]):
+            return None
+        filename = self.__filename(data, metric)
+        try:
+            matrix = np.load(filename, mmap_mode='r')
+            os.utime(filename)
+            return matrix
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+    def get(self, data: np.ndarray, metric: Metric):
+        """
+        Same as `load`, but the matrix is calculated and stored, if it isn't stored yet.
+
+        :return: None if the matrix of this size isn't stored (see `is_stored`)
+        """
+        n_samples = data.shape[0]
+        if not self.is_stored(n_samples):
+            return None
+        matrix = self.load(data, metric)
+        if matrix is not None:
+            return matrix
+        filename = self.__filename(data, metric)
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_write(filename) as tmp_filename:
+            matrix = np.lib.format.open_memmap(tmp_filename, mode='w+', dtype=np.float32,
+                                               shape=(n_samples, n_samples))
+            calc_distances(data, metric, matrix)
+            matrix.flush()
+            del matrix
+        evict_least_recently_used(self.directory, '.npy', self.max_size)
+        return np.load(filename, mmap_mode='r')
+
+
+distances = DistanceCache(os.path.join('cache', 'distances'))
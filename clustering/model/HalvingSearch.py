@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+import math
+import uuid
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from clustering.model.JobExecutor import Job
+from clustering.model.Model import AlgoConfig, Model
+
+# Each rung keeps 1/HALVING_ETA of configurations and clusters HALVING_ETA times more points
+HALVING_ETA = 3
+# Configurations are not compared on subsamples smaller than this
+HALVING_MIN_SAMPLE_SIZE = 1000
+
+
+@dataclass
+class Rung:
+    """
+    Attributes:
+        configs: indices of configurations evaluated in this rung
+        size: number of points, on which they are evaluated (the last rung uses the whole dataset)
+    """
+    configs: [int]
+    size: int
+
+
+def halving_schedule(n_configs: int, n_samples: int, eta: int = HALVING_ETA,
+                     min_size: int = HALVING_MIN_SAMPLE_SIZE) -> [(int, int)]:
+    """
+    :return: (number of configurations, sample size) for each rung. Rungs are added while more than one
+    configuration is left and the sample of the first rung is not smaller than `min_size`
+    """
+    n_rungs = 1
+    while math.ceil(n_configs / eta ** (n_rungs - 1)) > 1 and n_samples / eta ** n_rungs >= min_size:
+        n_rungs += 1
+    return [(math.ceil(n_configs / eta ** rung), n_samples // eta ** (n_rungs - 1 - rung))
+            for rung in range(n_rungs)]
+
+
+class HalvingSearch(QObject):
+    """
+    Successive halving on one dataset: all configurations are scored on a small stratified subsample, then only
+    the best 1/eta of them are scored on a sample eta times larger, and so on up to the whole dataset.
+    Runs of each rung are executed in the process pool of the model, the next rung is started, when all of them
+    are finished. Only the results of the best run on the whole dataset are kept in the model.
+
+    Signals:
+        evaluated: emitted with (index of configuration, index of rung, score) after each run
+        finished: emitted with id of AlgoRunResults of the best configuration (or None, if all runs failed)
+    """
+    evaluated = pyqtSignal(int, int, object)
+    finished = pyqtSignal(object)
+
+    def __init__(self, model: Model, dataset_id: uuid, algo_configs: [AlgoConfig], score_id: uuid,
+                 eta: int = HALVING_ETA, min_size: int = HALVING_MIN_SAMPLE_SIZE):
+        super().__init__()
+        self.model = model
+        self.dataset_id = dataset_id
+        self.algo_configs = algo_configs
+        self.score_id = score_id
+        self.score = model.scores[score_id]
+        self.n_samples = model.datasets[dataset_id].shape[0]
+        self.schedule = halving_schedule(len(algo_configs), self.n_samples, eta, min_size)
+        self.rungs: [Rung] = []
+        self.scores: dict[int, object] = {}
+        self.run_ids: dict[int, uuid] = {}
+        self.jobs: [Job] = []
+        self.pending = 0
+        self.best_run_id = None
+        self.cancelled = False
+        # Number of points clustered by all finished and running runs
+        self.clustered_points = 0
+
+    def full_grid_points(self) -> int:
+        """
+        :return: number of points, that would be clustered, if each configuration was run on the whole dataset
+        """
+        return len(self.algo_configs) * self.n_samples
+
+    def start(self):
+        self.__start_rung(list(range(len(self.algo_configs))))
+
+    def cancel(self):
+        """
+        Stops the search. Results of its runs are removed from the model, except the best run, if it has already
+        been reported with `finished`.
+        """
+        self.cancelled = True
+        for job in self.jobs:
+            job.cancel()
+        for algo_run_id in self.run_ids.values():
+            if algo_run_id != self.best_run_id:
+                self.model.remove_algo_run_results(algo_run_id)
+        self.run_ids = {}
+
+    def is_last_rung(self) -> bool:
+        return len(self.rungs) == len(self.schedule)
+
+    def __start_rung(self, configs: [int]):
+        rung = len(self.rungs)
+        _, size = self.schedule[rung]
+        self.rungs.append(Rung(configs, size))
+        self.scores = {}
+        self.jobs = []
+        self.pending = len(configs)
+        self.clustered_points += len(configs) * size
+        if self.is_last_rung():
+            # Runs on the whole dataset are added to the model, so that their results can be shown
+            jobs = self.model.submit_algo_matrix([self.dataset_id], [self.algo_configs[ind] for ind in configs],
+                                                 [self.score_id])
+            for (_, pos), job in jobs.items():
+                job.finished.connect(lambda algo_run_id, ind=configs[pos]: self.__run_added(ind, algo_run_id))
+                job.failed.connect(lambda _, ind=configs[pos]: self.__run_finished(ind, rung, None))
+                self.jobs.append(job)
+            return
+        for ind in configs:
+            # Same seed for all runs of the rung, so that configurations are compared on the same subsample
+            job = self.model.submit_subsample_run(self.dataset_id, self.algo_configs[ind], [self.score_id], size,
+                                                  seed=rung)
+            job.finished.connect(lambda scores, ind=ind: self.__run_finished(ind, rung, scores[self.score.name]))
+            job.failed.connect(lambda _, ind=ind: self.__run_finished(ind, rung, None))
+            self.jobs.append(job)
+
+    def __run_added(self, ind: int, algo_run_id: uuid):
+        if self.cancelled:
+            self.model.remove_algo_run_results(algo_run_id)
+            return
+        self.run_ids[ind] = algo_run_id
+        score = self.model.algo_run_results[algo_run_id].scores[self.score.name]
+        self.__run_finished(ind, len(self.rungs) - 1, score)
+
+    def __sort_key(self, ind: int):
+        score = self.scores.get(ind)
+        if score is None or math.isnan(score):
+            return math.inf
+        return -score if self.score.greater_is_better else score
+
+    def __run_finished(self, ind: int, rung: int, score):
+        if self.cancelled:
+            return
+        self.scores[ind] = score
+        self.pending -= 1
+        self.evaluated.emit(ind, rung, score)
+        if self.pending > 0:
+            return
+        ranked = sorted(self.rungs[-1].configs, key=self.__sort_key)
+        if not self.is_last_rung():
+            n_promoted, _ = self.schedule[len(self.rungs)]
+            self.__start_rung(sorted(ranked[:n_promoted]))
+            return
+        best = ranked[0] if self.__sort_key(ranked[0]) != math.inf else None
+        for ind, algo_run_id in self.run_ids.items():
+            if ind != best:
+                self.model.remove_algo_run_results(algo_run_id)
+        self.best_run_id = self.run_ids.get(best)
+        self.finished.emit(self.best_run_id)
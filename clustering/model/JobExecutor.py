@@ -0,0 +1,87 @@
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from collections.abc import Callable
+from enum import Enum
+import multiprocessing
+
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+
+class ExecutorKind(Enum):
+    ThreadPool = 0
+    ProcessPool = 1
+
+
+class Job(QObject):
+    """
+    This class is used to deliver the result of a background computation to the thread where the job was created
+    (normally the GUI thread).
+
+    Signals:
+        finished: emitted with the result of computation (processed with `on_result`, if specified)
+        failed: emitted with error message, if computation raised an exception or was cancelled
+    """
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    __done = pyqtSignal(object)
+
+    def __init__(self, on_result: Callable = None):
+        super().__init__()
+        self.future = None
+        self.on_result = on_result
+        # Queued even if the future is already done, so that listeners can be connected after `submit`
+        self.__done.connect(self.__done_listener, Qt.QueuedConnection)
+
+    def cancel(self) -> bool:
+        return self.future is not None and self.future.cancel()
+
+    def notify(self, future: Future):
+        # Called from the worker thread, so the result is passed through the queued signal
+        self.__done.emit(future)
+
+    def __done_listener(self, future: Future):
+        if future.cancelled():
+            self.failed.emit("Cancelled")
+            return
+        err = future.exception()
+        if err is not None:
+            self.failed.emit(str(err))
+            return
+        try:
+            result = future.result() if self.on_result is None else self.on_result(future.result())
+        except (KeyError, ValueError, TypeError, OverflowError) as err:
+            self.failed.emit(str(err))
+            return
+        self.finished.emit(result)
+
+
+class JobExecutor:
+    """
+    Wrapper around thread or process pool, that returns Job for each submitted function.
+    With process pool, submitted functions and their arguments should be picklable.
+    """
+
+    def __init__(self, kind: ExecutorKind = ExecutorKind.ThreadPool, max_workers: int = None):
+        self.kind = kind
+        self.max_workers = max_workers
+        # Forking the GUI process could copy locks held by its other threads (Qt, thread pool, OpenMP), so worker
+        # processes are started from scratch
+        self.__executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn')) \
+            if kind == ExecutorKind.ProcessPool else ThreadPoolExecutor(max_workers)
+        self.__jobs: set[Job] = set()
+
+    def submit(self, fun: Callable, *args, on_result: Callable = None) -> Job:
+        """
+        :param on_result: function that is called in the thread of the caller with the result of `fun`;
+        its return value is emitted in `Job.finished`
+        """
+        job = Job(on_result)
+        # Job should stay alive until its signals are delivered
+        self.__jobs.add(job)
+        job.finished.connect(lambda _: self.__jobs.discard(job))
+        job.failed.connect(lambda _: self.__jobs.discard(job))
+        job.future = self.__executor.submit(fun, *args)
+        job.future.add_done_callback(job.notify)
+        return job
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=False, cancel_futures=True)
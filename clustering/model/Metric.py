@@ -1,10 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
 from collections.abc import Callable
+import os
+import typing
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    import scipy.sparse
+
+# Blocks of distance matrix, that are calculated at the same time by all threads, take at most this number of bytes
+METRIC_MEMORY_BUDGET = 256 * 2 ** 20
 
 
 class Metric:
+    """
+    Distance between points.
+
+    Besides the whole matrix of distances (`pairwise`), it may be reduced by blocks of rows, so that memory used at
+    once is bounded by `memory_budget` (e.g. nearest neighbours of each point in large dataset). Blocks are calculated
+    by `n_jobs` threads.
+
+    Attributes:
+        metric_fun: vectorized function, that takes arrays x with shape (n_x, n_features) and y with shape
+            (n_y, n_features) and returns matrix of distances with shape (n_x, n_y)
+        aliases: names, by which the metric is referred to in parameters of algorithms (e.g. affinity="l1")
+    """
     name: str
     metric_fun: Callable
+    aliases: [str]
 
-    def __init__(self, name: str, metric_fun: Callable):
+    def __init__(self, name: str, metric_fun: Callable, aliases: [str] = None,
+                 memory_budget: int = METRIC_MEMORY_BUDGET, n_jobs: int = None):
+        """
+        :param memory_budget: maximal size of blocks of distance matrix, that are kept in memory at once, in bytes
+        :param n_jobs: number of threads calculating blocks (by default, number of processors)
+        """
         self.name = name
         self.metric_fun = metric_fun
+        self.aliases = [] if aliases is None else aliases
+        self.memory_budget = memory_budget
+        self.n_jobs = n_jobs
+
+    def pairwise(self, x: np.ndarray, y: np.ndarray = None) -> np.ndarray:
+        """
+        :return: matrix of distances between rows of x and rows of y (or x, if y is not specified)
+        """
+        return self.metric_fun(x, x if y is None else y)
+
+    def reduce_rows(self, x: np.ndarray, reduce: Callable[[np.ndarray, int], object], y: np.ndarray = None,
+                    memory_budget: int = None) -> list:
+        """
+        Calculates distance matrix between x and y by blocks of rows and reduces each block.
+
+        :param reduce: function, that takes block of distances between x[start:start + len(block)] and y and start
+        :param memory_budget: overrides `memory_budget` of the metric
+        :return: results of `reduce` for all blocks in order of rows
+        """
+        y = x if y is None else y
+        n_jobs = self.n_jobs or os.cpu_count() or 1
+        memory_budget = self.memory_budget if memory_budget is None else memory_budget
+        # Distances are usually calculated in float64
+        block_rows = max(1, memory_budget // (8 * max(1, y.shape[0]) * n_jobs))
+
+        def reduce_block(start: int):
+            return reduce(self.metric_fun(x[start:start + block_rows], y), start)
+
+        with ThreadPoolExecutor(n_jobs) as executor:
+            return list(executor.map(reduce_block, range(0, x.shape[0], block_rows)))
+
+    def nearest_k(self, x: np.ndarray, k: int, y: np.ndarray = None, memory_budget: int = None) \
+            -> (np.ndarray, np.ndarray):
+        """
+        :return: tuple (distances, indices) of arrays with shape (n_x, k): k nearest points of y (or x, then each
+        point is its own neighbour) to each point of x in ascending order of distance
+        """
+        def reduce(block: np.ndarray, start: int):
+            nearest = np.argpartition(block, k - 1, axis=1)[:, :k] if k < block.shape[1] \
+                else np.broadcast_to(np.arange(block.shape[1]), block.shape)
+            distances = np.take_along_axis(block, nearest, axis=1)
+            order = np.argsort(distances, axis=1, kind='stable')
+            return np.take_along_axis(distances, order, axis=1), np.take_along_axis(nearest, order, axis=1)
+
+        blocks = self.reduce_rows(x, reduce, y, memory_budget)
+        if not blocks:
+            return np.empty((0, k)), np.empty((0, k), dtype=np.int64)
+        return np.concatenate([distances for distances, _ in blocks]), \
+            np.concatenate([indices for _, indices in blocks])
+
+    def radius_neighbours(self, x: np.ndarray, radius: float, y: np.ndarray = None,
+                          memory_budget: int = None) -> 'scipy.sparse.csr_matrix':
+        """
+        :return: sparse matrix with shape (n_x, n_y), row i contains distances to the points of y (or x) not further
+        than radius from x[i]
+        """
+        from scipy.sparse import csr_matrix
+
+        def reduce(block: np.ndarray, start: int):
+            inside = block <= radius
+            return np.count_nonzero(inside, axis=1), np.nonzero(inside)[1], block[inside]
+
+        blocks = self.reduce_rows(x, reduce, y, memory_budget)
+        n_y = x.shape[0] if y is None else y.shape[0]
+        if not blocks:
+            return csr_matrix((x.shape[0], n_y))
+        counts, indices, distances = zip(*blocks)
+        indptr = np.concatenate([[0], np.cumsum(np.concatenate(counts))])
+        return csr_matrix((np.concatenate(distances), np.concatenate(indices), indptr), shape=(x.shape[0], n_y))
@@ -1,13 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
+import json
 import numpy as np
+import os
 import uuid
+import zipfile
 
 from PyQt5.QtCore import QSettings
 
-from clustering.model.Algorithm import Algorithm
+from clustering.model.Algorithm import Algorithm, INCREMENTAL_DATA_SIZE
+from clustering.model.ArrayCache import atomic_write
 from clustering.model.Dataset import Dataset
-from clustering.model.Score import Score
+from clustering.model.JobExecutor import ExecutorKind, Job, JobExecutor
+from clustering.model.Projection import ProjectionCache, ProjectionMethod
+from clustering.model.ResultCache import ResultCache
+from clustering.model.Score import Score, ScoreContext, score_from_json, score_to_json, stratified_subsample
 
 
 class AppMode(Enum):
@@ -35,10 +43,74 @@ class AlgoRunResults:
     pred: np.ndarray
     scores: dict
     dataset: uuid
+    # Fitted estimator, from which the reruns are warm-started (it isn't saved with the session)
+    estimator: object = None
+
+
+def run_algo(algorithm: Algorithm, dataset: Dataset, params: dict, scores: [Score],
+             cache: ResultCache = None, previous=None, keep_estimator: bool = False) -> (np.ndarray, dict, object):
+    """
+    Runs clustering and calculates scores. It is executed in the background, so it shouldn't touch the Model.
+    If the same run is found in the cache, only the missing scores are calculated.
+
+    :param previous: estimator of the previous run on this dataset, from which clustering is warm-started
+    :param keep_estimator: whether the fitted estimator is returned (it may be as large as the data, e.g. with labels
+    of all points, so it is returned only for runs, that can be rerun)
+    :return: tuple (pred, scores, estimator), estimator is None if it is not kept or not provided by the algorithm
+    """
+    key = None if cache is None else cache.key(dataset, algorithm, params)
+    cached = None if key is None else cache.load(key)
+    estimator = None
+    warm_started = False
+    if cached is None:
+        data = dataset.data
+        if data.nbytes > INCREMENTAL_DATA_SIZE and algorithm.is_incremental():
+            pred = algorithm.run_incremental(data, params)
+        else:
+            pred, estimator = algorithm.fit(data, params, previous)
+            warm_started = previous is not None and estimator is not None
+        calculated_scores = Model.calc_scores(pred, dataset, scores)
+    else:
+        pred, calculated_scores = cached
+        missing_scores = [score for score in scores if score.name not in calculated_scores]
+        if not missing_scores:
+            return pred, {score.name: calculated_scores[score.name] for score in scores}, None
+        calculated_scores.update(Model.calc_scores(pred, dataset, missing_scores))
+    # Warm-started result depends on the previous run, so it isn't stored in the cache
+    if key is not None and not warm_started:
+        cache.store(key, pred, calculated_scores)
+    return pred, {score.name: calculated_scores[score.name] for score in scores}, estimator if keep_estimator else None
+
+
+def run_on_subsample(algorithm: Algorithm, dataset: Dataset, params: dict, scores: [Score], size: int,
+                     seed: int) -> dict:
+    """
+    Runs clustering on a subsample of the dataset, stratified by target (if it is known), and calculates scores.
+    Runs with the same size and seed use the same subsample, so their scores can be compared.
+
+    :return: calculated scores
+    """
+    target = dataset.target
+    cluster_idx = np.zeros(dataset.shape[0], dtype=np.int64) if target is None \
+        else np.unique(target, return_inverse=True)[1].ravel()
+    idx = stratified_subsample(cluster_idx, size, np.random.default_rng(seed))
+    subsample = Dataset(dataset.data[idx], num_of_classes=dataset.num_of_classes,
+                        target=None if target is None else target[idx], feature_names=dataset.feature_names,
+                        name=dataset.name, titles=dataset.titles[idx])
+    pred, _ = algorithm.fit(subsample.data, params)
+    return Model.calc_scores(pred, subsample, scores)
 
 
 class Model:
-    def __init__(self, datasets: [Dataset], algorithms: [Algorithm], scores: [Score]):
+    def __init__(self, datasets: [Dataset], algorithms: [Algorithm], scores: [Score],
+                 executor_kind: ExecutorKind = ExecutorKind.ThreadPool, max_workers: int = None,
+                 matrix_workers: int = None, result_cache: ResultCache = None):
+        """
+        :param executor_kind: kind of executor for the runs added in research mode
+        :param max_workers: number of workers of this executor (by default, chosen by concurrent.futures)
+        :param matrix_workers: number of processes used to run the configurations in compare mode
+        :param result_cache: cache for results of runs (if None, results are not cached)
+        """
         self.datasets: dict[uuid, Dataset] = {
             uuid.uuid4(): dataset for dataset in datasets
         }
@@ -51,33 +123,100 @@ class Model:
         self.algo_run_results: dict[uuid, AlgoRunResults] = {}
         self.algo_configs: [AlgoConfig] = []
         self.mode = None
+        self.executor = JobExecutor(executor_kind, max_workers)
+        self.matrix_executor = JobExecutor(ExecutorKind.ProcessPool, matrix_workers)
+        self.result_cache = result_cache
+        self.projections = ProjectionCache(self.executor)
+
+    def __get_run_args(self, config: AlgoRunConfig):
+        return (self.algorithms[config.algo_config.algo_id],
+                self.datasets[config.dataset_id],
+                config.algo_config.params,
+                [self.scores[score_id] for score_id in config.score_ids],
+                self.result_cache)
 
-    def add_algo_run(self, config: AlgoRunConfig) -> uuid:
-        dataset = self.datasets[config.dataset_id]
-        algorithm = self.algorithms[config.algo_config.algo_id]
-        pred = algorithm.run(dataset.data, config.algo_config.params)
-        scores = self.calc_scores(pred, dataset, [self.scores[score_id] for score_id in config.score_ids])
+    def __add_results(self, config: AlgoRunConfig, pred: np.ndarray, scores: dict, estimator=None) -> uuid:
         algo_run_result_id = uuid.uuid4()
-        algo_run_result = AlgoRunResults(config, pred, scores, dataset)
-        self.algo_run_results[algo_run_result_id] = algo_run_result
+        self.algo_run_results[algo_run_result_id] = AlgoRunResults(config, pred, scores, config.dataset_id,
+                                                                   estimator)
         return algo_run_result_id
 
+    def submit_algo_run(self, config: AlgoRunConfig, previous_run_id: uuid = None) -> Job:
+        """
+        Runs clustering and calculates scores by the executor.
+        `Job.finished` is emitted with id of the new AlgoRunResults, `Job.failed` with error message.
+        Projection of the dataset is prefetched, so that results can be shown as soon as they are ready.
+
+        :param previous_run_id: id of the run, whose estimator is used to warm-start clustering
+        """
+        self.submit_projection(config.dataset_id)
+        previous = None if previous_run_id is None else self.algo_run_results[previous_run_id].estimator
+        return self.executor.submit(run_algo, *self.__get_run_args(config), previous, True,
+                                    on_result=lambda result: self.__add_results(config, *result))
+
+    def submit_algo_matrix(self, dataset_ids: [uuid], algo_configs: [AlgoConfig],
+                           score_ids: [uuid]) -> dict[(uuid, int), Job]:
+        """
+        Runs each configuration on each dataset in the process pool.
+
+        :return: jobs for the runs by (dataset_id, index of configuration); `Job.finished` is emitted with id of
+        the new AlgoRunResults as soon as the corresponding run is finished
+        """
+        jobs = {}
+        for dataset_id in dataset_ids:
+            for ind, algo_config in enumerate(algo_configs):
+                config = AlgoRunConfig(algo_config=algo_config, dataset_id=dataset_id, score_ids=score_ids)
+                jobs[(dataset_id, ind)] = self.matrix_executor.submit(
+                    run_algo, *self.__get_run_args(config),
+                    on_result=lambda result, config=config: self.__add_results(config, *result)
+                )
+        return jobs
+
+    def submit_subsample_run(self, dataset_id: uuid, algo_config: AlgoConfig, score_ids: [uuid], size: int,
+                             seed: int) -> Job:
+        """
+        Runs the configuration on a subsample of the dataset (see `run_on_subsample`) in the process pool.
+        Results are not added to the model, `Job.finished` is emitted with dict of scores.
+        """
+        algorithm, dataset, params, scores, _ = self.__get_run_args(AlgoRunConfig(algo_config, dataset_id, score_ids))
+        return self.matrix_executor.submit(run_on_subsample, algorithm, dataset, params, scores, size, seed)
+
+    def get_projection(self, dataset_id: uuid, method: ProjectionMethod = ProjectionMethod.PCA):
+        """
+        :return: 2d-projection of the dataset, or None if it is not calculated yet (see `submit_projection`)
+        """
+        return self.projections.get(dataset_id, method)
+
+    def submit_projection(self, dataset_id: uuid, method: ProjectionMethod = ProjectionMethod.PCA) -> Job:
+        """
+        Starts calculation of 2d-projection of the dataset by the executor.
+
+        :return: job, whose `Job.finished` is emitted with the projection, or None if it is already calculated
+        """
+        return self.projections.submit(dataset_id, self.datasets[dataset_id], method)
+
     def update_algo_configs(self, algo_configs: [AlgoConfig]):
         self.algo_configs = algo_configs
 
     @staticmethod
     def calc_scores(pred: np.ndarray, dataset: [Dataset], scores: [Score]):
-        result = {}
-        for score in scores:
-            result.update({score.name: score.calc_score(
-                data=dataset.data,
-                target=dataset.target,
-                pred=pred
-            )})
+        context = ScoreContext(dataset.data, dataset.target, pred)
+        result = {score.name: None for score in scores}
+        scores = [score for score in scores if score.is_applicable(context)]
+        # Each intermediate is calculated once, after that scores are independent of each other
+        context.prepare(set(it for score in scores for it in score.required_intermediates(context)))
+        if scores:
+            with ThreadPoolExecutor(min(len(scores), os.cpu_count() or 1)) as executor:
+                values = executor.map(lambda score: score.calc_score(context), scores)
+                result.update(zip([score.name for score in scores], values))
         return result
 
     def remove_algo_run_results(self, algo_run_results_id: uuid):
-        self.algo_run_results.pop(algo_run_results_id, None)
+        results = self.algo_run_results.pop(algo_run_results_id, None)
+        # Arrays of the dataset are loaded again, when it is used by the next run
+        if results is not None and all(other.config.dataset_id != results.config.dataset_id
+                                       for other in self.algo_run_results.values()):
+            self.datasets[results.config.dataset_id].release()
         # TODO check if item was removed
         return True
 
@@ -93,29 +232,44 @@ class Model:
         # TODO check if item was added
         return algorithm_id
 
+    def shutdown(self):
+        self.executor.shutdown()
+        self.matrix_executor.shutdown()
+
     def reload(self, mode: AppMode = None):
         self.algo_run_results.clear()
+        for dataset in self.datasets.values():
+            dataset.release()
         self.algo_configs.clear()
         self.mode = mode
 
-    def save(self, file="__last_run.ini"):
-        session = QSettings(file, QSettings.IniFormat)
-        session.setValue("mode", self.mode)
-        algo_runs = {}
+    @staticmethod
+    def __runs_dir(file: str) -> str:
+        return os.path.splitext(file)[0] + '_runs'
+
+    def save(self, file="__last_run.json"):
+        """
+        Saves session as json-file with everything except predictions, which are stored in separate npz-files in
+        directory `<file>_runs`. Predictions never change, so only the files of new runs are written.
+        """
+        runs_dir = self.__runs_dir(file)
+        os.makedirs(runs_dir, exist_ok=True)
+        algo_runs = []
         for algo_run_id in self.algo_run_results.keys():
             algo_run = self.algo_run_results[algo_run_id]
-            algo_name = self.algorithms[algo_run.config.algo_config.algo_id].name
-            dataset_name = self.datasets[algo_run.config.dataset_id].name
-            if dataset_name not in algo_runs.keys():
-                algo_runs[dataset_name] = []
-            algo_runs[dataset_name].append({
+            pred_file = f"{algo_run_id}.npz"
+            if not os.path.exists(os.path.join(runs_dir, pred_file)):
+                with atomic_write(os.path.join(runs_dir, pred_file)) as tmp_file, open(tmp_file, 'wb') as npz_file:
+                    np.savez_compressed(npz_file, pred=np.asarray(algo_run.pred))
+            algo_runs.append({
+                "id": str(algo_run_id),
+                "dataset_name": self.datasets[algo_run.config.dataset_id].name,
                 "algo_config_name": algo_run.config.algo_config.name,
-                "algo_name": algo_name,
+                "algo_name": self.algorithms[algo_run.config.algo_config.algo_id].name,
                 "params": algo_run.config.algo_config.params,
-                "scores": algo_run.scores,
-                "pred": algo_run.pred
+                "scores": {name: score_to_json(value) for name, value in algo_run.scores.items()},
+                "pred_file": pred_file
             })
-        session.setValue("algo_runs", algo_runs)
 
         algo_configs = []
         for config in self.algo_configs:
@@ -125,45 +279,85 @@ class Model:
                 "algo_name": algo_name,
                 "params": config.params
             })
-        session.setValue("algo_configs", algo_configs)
 
-        session.sync()
+        session = {
+            "mode": None if self.mode is None else self.mode.name,
+            "algo_runs": algo_runs,
+            "algo_configs": algo_configs
+        }
+        with atomic_write(file) as tmp_file, open(tmp_file, 'w') as json_file:
+            json.dump(session, json_file, default=float)
+
+        # Predictions of removed runs are not needed anymore
+        saved_files = set(algo_run["pred_file"] for algo_run in algo_runs)
+        for entry in os.scandir(runs_dir):
+            if entry.name.endswith('.npz') and entry.name not in saved_files:
+                os.remove(entry.path)
 
-    def load_from_file(self, file="__last_run.ini") -> bool:
+    def load_from_file(self, file="__last_run.json") -> bool:
         self.reload()
-        session = QSettings(file, QSettings.IniFormat)
-        self.mode = session.value("mode")
+        if file.endswith('.ini'):
+            return self.__load_from_ini(file)
+        if not os.path.exists(file):
+            # Sessions were saved in ini-files by earlier versions
+            legacy_file = os.path.splitext(file)[0] + '.ini'
+            return os.path.exists(legacy_file) and self.__load_from_ini(legacy_file)
 
+        # Session may be truncated, if the app was killed while saving it with an earlier version
+        try:
+            with open(file, 'r') as json_file:
+                session = json.load(json_file)
+            mode = session["mode"]
+            algo_runs, algo_configs = list(session["algo_runs"]), list(session["algo_configs"])
+            self.mode = None if mode is None else AppMode[mode]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.reload()
+            return False
         if self.mode is None:
             return False
 
+        runs_dir = self.__runs_dir(file)
+        datasets_dict = {self.datasets[dataset_id].name: dataset_id for dataset_id in self.datasets.keys()}
+        for algo_run in algo_runs:
+            # Runs with missing or damaged predictions (or of removed algorithms) are skipped
+            try:
+                if algo_run["dataset_name"] not in datasets_dict.keys():
+                    continue
+                with np.load(os.path.join(runs_dir, algo_run["pred_file"])) as pred_file:
+                    pred = pred_file["pred"]
+                self.__add_loaded_run(uuid.UUID(algo_run["id"]), algo_run, algo_run["dataset_name"], pred,
+                                      {name: score_from_json(value) for name, value in algo_run["scores"].items()})
+            except (OSError, ValueError, KeyError, TypeError, EOFError, zipfile.BadZipFile):
+                continue
+        self.__add_loaded_configs(algo_configs)
+        return True
+
+    def __add_loaded_run(self, algo_run_id: uuid, algo_run: dict, dataset_name: str, pred: np.ndarray,
+                         scores: dict):
         algorithms_dict = {self.algorithms[algo_id].name: algo_id for algo_id in self.algorithms.keys()}
         datasets_dict = {self.datasets[dataset_id].name: dataset_id for dataset_id in self.datasets.keys()}
         scores_dict = {self.scores[score_id].name: score_id for score_id in self.scores.keys()}
+        self.algo_run_results[algo_run_id] = AlgoRunResults(
+            config=AlgoRunConfig(
+                AlgoConfig(
+                    name=algo_run["algo_config_name"],
+                    algo_id=algorithms_dict[algo_run["algo_name"]],
+                    params=algo_run["params"]
+                ),
+                dataset_id=datasets_dict[dataset_name],
+                score_ids=list([scores_dict[score_name] for score_name in scores.keys()])
+            ),
+            pred=pred,
+            scores=scores,
+            dataset=datasets_dict[dataset_name]
+        )
 
-        algo_runs = session.value("algo_runs") or []
-        for dataset_name in algo_runs:
-            if dataset_name not in datasets_dict.keys():
-                continue
-            for algo_run in algo_runs[dataset_name]:
-                algo_run_result_id = uuid.uuid4()
-                self.algo_run_results[algo_run_result_id] = AlgoRunResults(
-                    config=AlgoRunConfig(
-                        AlgoConfig(
-                            name=algo_run["algo_config_name"],
-                            algo_id=algorithms_dict[algo_run["algo_name"]],
-                            params=algo_run["params"]
-                        ),
-                        dataset_id=datasets_dict[dataset_name],
-                        score_ids=list([scores_dict[score_name] for score_name in algo_run["scores"].keys()])
-                    ),
-                    pred=algo_run["pred"],
-                    scores=algo_run["scores"],
-                    dataset=datasets_dict[dataset_name]
-                )
-
-        algo_configs = session.value("algo_configs") or []
+    def __add_loaded_configs(self, algo_configs: [dict]):
+        algorithms_dict = {self.algorithms[algo_id].name: algo_id for algo_id in self.algorithms.keys()}
         for algo_config in algo_configs:
+            # Configurations of removed algorithms are skipped
+            if algo_config.get("algo_name") not in algorithms_dict:
+                continue
             config = AlgoConfig(
                 name=algo_config["algo_config_name"],
                 algo_id=algorithms_dict[algo_config["algo_name"]],
@@ -171,4 +365,20 @@ class Model:
             )
             self.algo_configs.append(config)
 
+    def __load_from_ini(self, file: str) -> bool:
+        self.reload()
+        session = QSettings(file, QSettings.IniFormat)
+        self.mode = session.value("mode")
+
+        if self.mode is None:
+            return False
+
+        datasets_dict = {self.datasets[dataset_id].name: dataset_id for dataset_id in self.datasets.keys()}
+        algo_runs = session.value("algo_runs") or []
+        for dataset_name in algo_runs:
+            if dataset_name not in datasets_dict.keys():
+                continue
+            for algo_run in algo_runs[dataset_name]:
+                self.__add_loaded_run(uuid.uuid4(), algo_run, dataset_name, algo_run["pred"], algo_run["scores"])
+        self.__add_loaded_configs(session.value("algo_configs") or [])
         return True
@@ -0,0 +1,92 @@
+from enum import Enum
+from functools import partial
+import uuid
+
+import numpy as np
+
+from clustering.model.Algorithm import INCREMENTAL_CHUNK_SIZE, INCREMENTAL_DATA_SIZE
+from clustering.model.Dataset import Dataset, load_projection, save_projection
+from clustering.model.JobExecutor import Job, JobExecutor
+
+
+class ProjectionMethod(Enum):
+    """
+    Methods of projecting datasets onto the plane. Enum value is used in the name of the file with projection.
+    """
+    PCA = 'pca'
+
+
+def _pca(data: np.ndarray) -> np.ndarray:
+    """
+    Large (e.g. memory-mapped) data is fitted and transformed by chunks, so that it is never loaded in memory
+    at once.
+    """
+    from sklearn.decomposition import IncrementalPCA, PCA
+    if data.nbytes <= INCREMENTAL_DATA_SIZE:
+        return PCA(n_components=2).fit_transform(data)
+    from sklearn.utils import gen_batches
+    # Each chunk should contain at least n_components points, so the last small chunk is merged with the previous one
+    chunks = list(gen_batches(data.shape[0], INCREMENTAL_CHUNK_SIZE, min_batch_size=2))
+    pca = IncrementalPCA(n_components=2)
+    for chunk in chunks:
+        pca.partial_fit(np.asarray(data[chunk]))
+    return np.concatenate([pca.transform(np.asarray(data[chunk])) for chunk in chunks])
+
+
+def calc_projection(dataset: Dataset, method: ProjectionMethod) -> np.ndarray:
+    """
+    Loads projection saved next to the dataset or calculates (and saves) it.
+    Called by `ProjectionCache.submit` in the executor, the result is kept by the cache in the calling thread.
+
+    :return: array with shape (n_samples, 2)
+    """
+    if dataset.shape[1] == 2:
+        return np.asarray(dataset.data, dtype=np.float64)
+    points = load_projection(dataset, method.value)
+    if points is not None:
+        return points
+    if method == ProjectionMethod.PCA:
+        points = _pca(dataset.data)
+    else:
+        raise ValueError(f"Unknown projection method {method}")
+    save_projection(dataset, method.value, points)
+    return points
+
+
+class ProjectionCache:
+    """
+    This class is used to calculate 2d-projection of each dataset only once and share it between all views of
+    this dataset. Projections are calculated by the executor and kept in memory by (dataset_id, method).
+    """
+
+    def __init__(self, executor: JobExecutor):
+        self.executor = executor
+        self.__projections: dict[(uuid, ProjectionMethod), np.ndarray] = {}
+        self.__jobs: dict[(uuid, ProjectionMethod), Job] = {}
+
+    def get(self, dataset_id: uuid, method: ProjectionMethod = ProjectionMethod.PCA):
+        """
+        :return: projection, if it is already calculated, otherwise None
+        """
+        return self.__projections.get((dataset_id, method))
+
+    def submit(self, dataset_id: uuid, dataset: Dataset, method: ProjectionMethod = ProjectionMethod.PCA) -> Job:
+        """
+        Starts calculation of the projection, if it is not calculated or being calculated yet.
+
+        :return: job, whose `Job.finished` is emitted with the projection, or None if it is already calculated
+        """
+        key = (dataset_id, method)
+        if key in self.__projections:
+            return None
+        if key not in self.__jobs:
+            job = self.executor.submit(calc_projection, dataset, method, on_result=partial(self.__store, key))
+            job.failed.connect(lambda _: self.__jobs.pop(key, None))
+            self.__jobs[key] = job
+        return self.__jobs[key]
+
+    def __store(self, key: (uuid, ProjectionMethod), points: np.ndarray) -> np.ndarray:
+        self.__projections[key] = points
+        self.__jobs.pop(key, None)
+        return points
+
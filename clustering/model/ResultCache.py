@@ -0,0 +1,50 @@
+import hashlib
+import json
+
+import numpy as np
+
+from clustering.model.Algorithm import Algorithm
+from clustering.model.ArrayCache import ArrayCache
+from clustering.model.Dataset import Dataset
+from clustering.model.Score import score_from_json, score_to_json
+
+
+class ResultCache:
+    """
+    This class is used to store results of algorithm runs on disk, so that they are not recalculated
+    when the same algorithm is launched with the same parameters on the same dataset.
+
+    Results are kept in `ArrayCache` under `max_size` bytes, see it for their files and eviction.
+    """
+
+    def __init__(self, directory: str = 'cache', max_size: int = 512 * 2 ** 20):
+        self.directory = directory
+        self.max_size = max_size
+        self.__arrays = ArrayCache(directory, max_size)
+
+    @staticmethod
+    def key(dataset: Dataset, algorithm: Algorithm, params: dict):
+        """
+        :return: key for the run, or None if the result shouldn't be cached
+        """
+        if not algorithm.deterministic and params.get('random_state') is None:
+            return None
+        description = json.dumps([dataset.content_hash(), algorithm.name, params], sort_keys=True, default=str)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def load(self, key: str):
+        """
+        :return: tuple (pred, scores) or None, if there is no result with this key
+        """
+        arrays = self.__arrays.load(key)
+        if arrays is None:
+            return None
+        try:
+            scores = json.loads(str(arrays['scores']))
+            return arrays['pred'], {name: score_from_json(value) for name, value in scores.items()}
+        except (KeyError, ValueError):
+            return None
+
+    def store(self, key: str, pred: np.ndarray, scores: dict):
+        scores = json.dumps({name: score_to_json(value) for name, value in scores.items()}, default=float)
+        self.__arrays.store(key, {'pred': np.asarray(pred), 'scores': np.array(scores)})
@@ -1,24 +1,253 @@
 from collections.abc import Callable
+from enum import Enum
+import math
+import time
+import typing
 import numpy as np
 
+from clustering.model.Algorithm import INCREMENTAL_CHUNK_SIZE
+from clustering.model.DistanceMatrix import DistanceCache, distances
+
+if typing.TYPE_CHECKING:
+    import scipy.sparse
+
+# Scores with `approximate=True` are estimated on subsamples, if their exact calculation would need more memory
+# (for n x n float matrix) than this, in bytes
+APPROXIMATION_MEMORY_BUDGET = 256 * 2 ** 20
+# Subsamples are drawn while this time (in seconds) is not exceeded
+APPROXIMATION_TIME_BUDGET = 5.0
+APPROXIMATION_MIN_SUBSAMPLES = 3
+APPROXIMATION_MAX_SUBSAMPLES = 30
+
+
+class ScoreEstimate(float):
+    """
+    Value of score estimated on subsamples, [low, high] is its 95% confidence interval.
+    It can be used everywhere the exact value of score is used.
+    """
+    low: float
+    high: float
+
+    def __new__(cls, value: float, low: float, high: float):
+        estimate = super().__new__(cls, value)
+        estimate.low = low
+        estimate.high = high
+        return estimate
+
+    def __reduce__(self):
+        return ScoreEstimate, (float(self), self.low, self.high)
+
+    def __repr__(self):
+        return f"ScoreEstimate({float(self)}, {self.low}, {self.high})"
+
+
+def score_to_json(value):
+    if isinstance(value, ScoreEstimate):
+        return {'value': float(value), 'low': value.low, 'high': value.high}
+    return value
+
+
+def score_from_json(value):
+    if isinstance(value, dict):
+        return ScoreEstimate(value['value'], value['low'], value['high'])
+    return value
+
+
+def contingency_table(target: np.ndarray, pred: np.ndarray) -> 'scipy.sparse.csr_matrix':
+    """
+    :return: sparse matrix with shape (n_classes, n_clusters), where element (i, j) is the number of points from
+    i-th class in j-th cluster. Classes and clusters are numbered in ascending order of their labels, so any labels
+    (e.g. -1 for noise) are allowed
+    """
+    import scipy.sparse as sp
+    classes, class_idx = np.unique(target, return_inverse=True)
+    clusters, cluster_idx = np.unique(pred, return_inverse=True)
+    table = sp.coo_matrix((np.ones(class_idx.shape[0], dtype=np.int64), (class_idx.ravel(), cluster_idx.ravel())),
+                          shape=(classes.shape[0], clusters.shape[0]))
+    # Duplicated entries are summed up during conversion
+    return table.tocsr()
+
+
+class Intermediate(Enum):
+    """
+    Values, that are expensive to calculate and may be shared by several scores.
+    Enum value is the name of the keyword argument, with which the value is passed to `score_fun`.
+    """
+    Contingency = 'contingency'
+    ClusterSizes = 'cluster_sizes'
+    Centroids = 'centroids'
+    PairwiseDistances = 'pairwise_distances'
+
+
+class ScoreContext:
+    """
+    This class is used to calculate each intermediate only once for all scores of one algorithm run.
+
+    Clusters are numbered in ascending order of their labels, `cluster_idx[i]` is the number of cluster of i-th point.
+    """
+
+    def __init__(self, data: np.ndarray, target: np.ndarray, pred: np.ndarray, store_distances: bool = True):
+        """
+        :param store_distances: whether pairwise distances are taken from the distance cache (it shouldn't be used
+        for random subsamples, which are never used again)
+        """
+        self.data = data
+        self.target = target
+        self.pred = pred
+        self.store_distances = store_distances
+        self.__values: dict[Intermediate, object] = {}
+        self.__cluster_idx = None
+
+    @property
+    def cluster_idx(self) -> np.ndarray:
+        if self.__cluster_idx is None:
+            self.__cluster_idx = np.unique(self.pred, return_inverse=True)[1].ravel()
+        return self.__cluster_idx
+
+    def prepare(self, intermediates: [Intermediate]):
+        """
+        Calculates all intermediates beforehand, so that scores may be evaluated concurrently.
+        """
+        for intermediate in intermediates:
+            try:
+                self.get(intermediate)
+            except Exception:
+                pass
+
+    def get(self, intermediate: Intermediate):
+        if intermediate not in self.__values:
+            try:
+                self.__values[intermediate] = self.__calc(intermediate)
+            except Exception as err:
+                # Failure is remembered, so that it is not recalculated by each score
+                self.__values[intermediate] = err
+        value = self.__values[intermediate]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def __calc(self, intermediate: Intermediate):
+        if intermediate == Intermediate.Contingency:
+            return contingency_table(self.target, self.pred)
+        if intermediate == Intermediate.ClusterSizes:
+            return np.bincount(self.cluster_idx)
+        if intermediate == Intermediate.Centroids:
+            sizes = self.get(Intermediate.ClusterSizes)
+            sums = np.zeros((sizes.shape[0], self.data.shape[1]))
+            # Data may be memory-mapped, so it is read once by chunks of rows, like by incremental algorithms
+            for start in range(0, self.data.shape[0], INCREMENTAL_CHUNK_SIZE):
+                chunk = np.asarray(self.data[start:start + INCREMENTAL_CHUNK_SIZE])
+                chunk_idx = self.cluster_idx[start:start + INCREMENTAL_CHUNK_SIZE]
+                sums += np.stack([np.bincount(chunk_idx, weights=chunk[:, j], minlength=sizes.shape[0])
+                                  for j in range(chunk.shape[1])], axis=1)
+            return sums / sizes[:, np.newaxis]
+        if intermediate == Intermediate.PairwiseDistances:
+            from clustering.metrics.default_metrics import get_metric
+            euclidean = get_metric('euclidean')
+            matrix = distances.get(self.data, euclidean) if self.store_distances else None
+            return euclidean.pairwise(self.data) if matrix is None else matrix
+        raise ValueError(f"Unknown intermediate {intermediate}")
+
+
+def stratified_subsample(cluster_idx: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    :return: sorted indices of min(size, n) points, each cluster is represented proportionally to its size.
+    If there are not more clusters than `size`, each cluster is represented at least by one point
+    """
+    n = cluster_idx.shape[0]
+    perm = rng.permutation(n)
+    perm = perm[np.argsort(cluster_idx[perm], kind='stable')]
+    sizes = np.bincount(cluster_idx)
+    ranks = np.arange(n) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    base = 1 if len(sizes) <= size else 0
+    # The rest of points is distributed proportionally by the largest remainder method, so quotas sum up to size
+    budget = min(size, n) - base * len(sizes)
+    exact = budget * (sizes - base) / max(1, n - base * len(sizes))
+    quotas = np.floor(exact).astype(np.int64)
+    # Ties are broken randomly, e.g. when there are more clusters than points in the subsample
+    order = rng.permutation(len(sizes))
+    order = order[np.argsort(quotas[order] - exact[order], kind='stable')]
+    quotas[order[:budget - quotas.sum()]] += 1
+    return np.sort(perm[ranks < np.repeat(quotas + base, sizes)])
+
 
 class Score:
-    # Works with supposition that each score either takes (data, pred) or (target, pred)
+    """
+    Works with supposition that each score either takes (data, pred) or contingency table of (target, pred).
+    Besides that, score may require intermediates: they are passed to `score_fun` as keyword arguments.
+    """
     name: str
     score_fun: Callable
     needs_target: bool
+    requires: [Intermediate]
 
-    def __init__(self, name: str, score_fun: Callable, needs_target: bool):
+    def __init__(self, name: str, score_fun: Callable, needs_target: bool, requires: [Intermediate] = None,
+                 approximate: bool = False, greater_is_better: bool = True):
+        """
+        :param approximate: whether the score takes O(n^2) time and memory and should be estimated on stratified
+        subsamples for large datasets (see APPROXIMATION_MEMORY_BUDGET)
+        :param greater_is_better: whether greater values of the score mean better clustering
+        """
         self.name = name
         self.score_fun = score_fun
         self.needs_target = needs_target
+        self.requires = [] if requires is None else requires
+        self.approximate = approximate
+        self.greater_is_better = greater_is_better
+        if needs_target and Intermediate.Contingency not in self.requires:
+            self.requires = [Intermediate.Contingency] + self.requires
+
+    def is_applicable(self, context: ScoreContext) -> bool:
+        return context.pred is not None and \
+            (context.target is not None if self.needs_target else context.data is not None)
+
+    def is_approximated(self, context: ScoreContext) -> bool:
+        # Stored distance matrix is memory-mapped, so it doesn't count against the budget
+        n_samples = len(context.pred)
+        return self.approximate and 8 * n_samples ** 2 > APPROXIMATION_MEMORY_BUDGET and \
+            not (context.store_distances and DistanceCache.is_stored(n_samples))
 
-    def calc_score(self, data: np.ndarray = None, target: np.ndarray = None, pred: np.ndarray = None):
-        if pred is None or (self.needs_target and target is None) or (not self.needs_target and data is None):
+    def required_intermediates(self, context: ScoreContext) -> [Intermediate]:
+        """
+        :return: intermediates, that should be calculated for the whole dataset
+        """
+        return [] if self.is_approximated(context) else self.requires
+
+    def calc_score(self, context: ScoreContext):
+        if not self.is_applicable(context):
             return None
+        if self.is_approximated(context):
+            return self.__estimate_score(context)
+        return self.__calc_exact_score(context)
+
+    def __estimate_score(self, context: ScoreContext):
+        sample_size = int(math.sqrt(APPROXIMATION_MEMORY_BUDGET / 8))
+        rng = np.random.default_rng(0)
+        values = []
+        start = time.monotonic()
+        for _ in range(APPROXIMATION_MAX_SUBSAMPLES):
+            if len(values) >= APPROXIMATION_MIN_SUBSAMPLES and time.monotonic() - start > APPROXIMATION_TIME_BUDGET:
+                break
+            idx = stratified_subsample(context.cluster_idx, sample_size, rng)
+            value = self.__calc_exact_score(ScoreContext(
+                data=None if context.data is None else context.data[idx],
+                target=None if context.target is None else context.target[idx],
+                pred=context.pred[idx],
+                store_distances=False
+            ))
+            if value is None:
+                return None
+            values.append(value)
+        mean = float(np.mean(values))
+        half_width = 1.96 * float(np.std(values, ddof=1)) / math.sqrt(len(values))
+        return ScoreEstimate(mean, mean - half_width, mean + half_width)
+
+    def __calc_exact_score(self, context: ScoreContext):
         try:
             if self.needs_target:
-                return self.score_fun(target, pred)
-            return self.score_fun(data, pred)
+                kwargs = {it.value: context.get(it) for it in self.requires if it != Intermediate.Contingency}
+                return self.score_fun(context.get(Intermediate.Contingency), **kwargs)
+            kwargs = {it.value: context.get(it) for it in self.requires}
+            return self.score_fun(context.data, context.pred, **kwargs)
         except Exception:
             return None
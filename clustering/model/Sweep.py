@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+import math
+import uuid
+
+import numpy as np
+
+from clustering.model.Algorithm import AlgoParams
+from clustering.model.Model import AlgoConfig
+
+
+def parse_param_values(text: str, kind: type, items: [str] = None) -> list:
+    """
+    Parses values of parameter for sweep. Values are separated by commas, numeric values may also be given
+    by ranges `start:stop:step` (stop is included), e.g. "2:10:2, 20" means [2, 4, 6, 8, 10, 20].
+
+    :param kind: int, float, bool or str
+    :param items: allowed values for str parameter
+    :raise ValueError: if text can't be parsed
+    """
+    values = []
+    for part in filter(None, map(str.strip, text.split(','))):
+        if part.lower() == 'none':
+            values.append(None)
+        elif kind in (int, float) and ':' in part:
+            start, stop, step = (list(map(kind, part.split(':'))) + [kind(1)])[:3]
+            if step <= 0:
+                raise ValueError(f"Step of range {part} should be positive")
+            # Small epsilon, so that stop is included despite rounding of floats
+            values.extend(kind(value) for value in np.arange(start, stop + step * 1e-9, step))
+        elif kind == bool:
+            if part.lower() not in ('true', 'false'):
+                raise ValueError(f"{part} is not a bool value")
+            values.append(part.lower() == 'true')
+        elif kind == str:
+            if items is not None and part not in items:
+                raise ValueError(f"{part} is not one of {', '.join(items)}")
+            values.append(part)
+        else:
+            values.append(kind(part))
+    return values
+
+
+def param_kinds(params: AlgoParams) -> dict[str, (type, [str])]:
+    """
+    :return: type and allowed items of each parameter declared in AlgoParams
+    """
+    kinds = {name: (int, None) for name in params.int_params}
+    kinds.update({name: (float, None) for name in params.float_params})
+    kinds.update({name: (bool, None) for name in params.bool_params})
+    kinds.update({param.name: (str, param.items) for param in params.selectable_params})
+    return kinds
+
+
+@dataclass
+class SweepConfig:
+    """
+    Set of configurations of one algorithm: each parameter takes each of its values.
+
+    Attributes:
+        values: values of each swept parameter, other parameters are not specified
+        n_samples: if specified, only this number of configurations is sampled randomly from the grid
+        patience: if specified, runs on a dataset are stopped, when the best score hasn't improved for this number
+        of finished runs by more than `tolerance`
+    """
+    name: str
+    algo_id: uuid
+    values: dict[str, list]
+    n_samples: int = None
+    patience: int = None
+    random_state: int = 0
+    tolerance: float = 1e-4
+
+    def grid_size(self) -> int:
+        return math.prod(len(values) for values in self.values.values())
+
+    def expand(self) -> [AlgoConfig]:
+        """
+        :return: configurations of the sweep. They are shuffled, when early stopping is used, so that it isn't
+        triggered by the order of the grid
+        """
+        names = list(self.values.keys())
+        sizes = [len(self.values[name]) for name in names]
+        size = self.grid_size()
+        rng = np.random.default_rng(self.random_state)
+        if self.n_samples is not None and self.n_samples < size:
+            indices = rng.choice(size, self.n_samples, replace=False)
+        elif self.patience is not None:
+            indices = rng.permutation(size)
+        else:
+            indices = range(size)
+        configs = []
+        for index in indices:
+            # Index of configuration in the grid is decoded as a number in mixed radix
+            params = {}
+            for name, radix in zip(reversed(names), reversed(sizes)):
+                params[name] = self.values[name][index % radix]
+                index //= radix
+            params = {name: params[name] for name in names}
+            description = ', '.join(f"{name}={value}" for name, value in params.items())
+            configs.append(AlgoConfig(name=f"{self.name} ({description})", algo_id=self.algo_id, params=params))
+        return configs
+
+
+class EarlyStopping:
+    """
+    Tracks scores of finished runs and tells, when the best of them hasn't improved for `patience` runs.
+    """
+
+    def __init__(self, patience: int, greater_is_better: bool = True, tolerance: float = 1e-4):
+        self.patience = patience
+        self.sign = 1 if greater_is_better else -1
+        self.tolerance = tolerance
+        self.best = None
+        self.runs_without_improvement = 0
+
+    def update(self, score) -> bool:
+        """
+        :return: True if the runs should be stopped
+        """
+        if score is not None and not math.isnan(score) and \
+                (self.best is None or self.sign * (score - self.best) > self.tolerance):
+            self.best = score
+            self.runs_without_improvement = 0
+        else:
+            self.runs_without_improvement += 1
+        return self.runs_without_improvement >= self.patience
+
@@ -1,15 +1,17 @@
 import os
 import shutil
 import uuid
-import numpy as np
-import pandas
-from copy import copy
+from collections.abc import Callable
+from functools import partial
 
 from clustering.model.Dataset import get_cols_with_type, get_feature_cols
 from clustering.model.Model import AlgoRunConfig, AlgoRunResults, AlgoConfig
 from clustering.model.Dataset import DuplicatedDatasetNameError, add_dataset, generate_random_dataset
 from clustering.model.Algorithm import load_algorithms, load_algorithms_from_module
-from clustering.model.Dataset import load_from_csv, normalise_dataset, Dataset
+from clustering.model.HalvingSearch import HalvingSearch
+from clustering.model.JobExecutor import Job
+from clustering.model.Sweep import SweepConfig
+from clustering.model.Dataset import import_from_csv, load_csv_sample, write_csv_chunks, Dataset
 from clustering.view.SelectModeDialog import SelectModeDialog
 
 
@@ -21,6 +23,10 @@ class Presenter:
     def __init__(self):
         self.model = None
         self.view = None
+        # Runs submitted in research mode; results of the runs from the previous session are dropped
+        self.__pending_jobs: set[Job] = set()
+        self.__session = 0
+        self.__pending_reruns: set[uuid] = set()
 
     def set_model(self, model):
         self.model = model
@@ -40,6 +46,18 @@ class Presenter:
     def get_dataset_points(self, dataset_id: uuid):
         return self.model.datasets[dataset_id].data
 
+    def request_dataset_projection(self, dataset_id: uuid, callback):
+        """
+        Calls `callback` with 2d-projection of the dataset, when it is calculated.
+        """
+        points = self.model.get_projection(dataset_id)
+        if points is not None:
+            callback(points)
+            return
+        job = self.model.submit_projection(dataset_id)
+        job.finished.connect(callback)
+        job.failed.connect(self.view.show_error)
+
     def get_dataset_titles(self, dataset_id: uuid):
         return self.model.datasets[dataset_id].titles
 
@@ -49,6 +67,12 @@ class Presenter:
     def get_score_name(self, score_id: uuid):
         return self.model.scores[score_id].name
 
+    def is_score_greater_better(self, score_id: uuid) -> bool:
+        return self.model.scores[score_id].greater_is_better
+
+    def get_algo_ids(self):
+        return self.model.algorithms.keys()
+
     def get_algo_run_results(self, algo_run_id: uuid) -> AlgoRunResults:
         return self.model.algo_run_results[algo_run_id]
 
@@ -58,10 +82,15 @@ class Presenter:
     def update_algo_configs(self, algo_configs: [AlgoConfig]):
         self.model.algo_configs = algo_configs
 
-    def rerun_algo_pushed(self, algo_run_id: uuid, params: dict):
+    def rerun_algo_pushed(self, algo_run_id: uuid, params: dict) -> Job:
+        """
+        :return: job of the rerun, or None if it wasn't started (e.g. the previous rerun of this run isn't finished)
+        """
+        if algo_run_id in self.__pending_reruns:
+            return None
         try:
             prev_results: AlgoRunResults = self.get_algo_run_results(algo_run_id)
-            next_algo_run_id = self.model.add_algo_run(AlgoRunConfig(
+            job = self.model.submit_algo_run(AlgoRunConfig(
                 algo_config=AlgoConfig(
                     name=prev_results.config.algo_config.name,
                     algo_id=prev_results.config.algo_config.algo_id,
@@ -69,30 +98,96 @@ class Presenter:
                 ),
                 dataset_id=prev_results.config.dataset_id,
                 score_ids=prev_results.config.score_ids
-            ))
-            self.model.remove_algo_run_results(algo_run_id)
-            self.view.change_algo_run_results(algo_run_id, next_algo_run_id)
+            ), previous_run_id=algo_run_id)
         except (KeyError, ValueError, TypeError, OverflowError) as err:
             self.view.show_error(str(err))
+            return None
+        self.__pending_reruns.add(algo_run_id)
+        self.__track_job(job, partial(self.__algo_rerun_finished, algo_run_id))
+        job.finished.connect(lambda _: self.__pending_reruns.discard(algo_run_id))
+        job.failed.connect(lambda _: self.__pending_reruns.discard(algo_run_id))
+        return job
+
+    def __track_job(self, job: Job, on_finished):
+        """
+        Calls `on_finished` with id of the new results, if the job is finished in the current session.
+        Otherwise, the results are removed from the model.
+        """
+        session = self.__session
+        self.__pending_jobs.add(job)
+
+        def finished(algo_run_id: uuid):
+            self.__pending_jobs.discard(job)
+            if session != self.__session:
+                self.model.remove_algo_run_results(algo_run_id)
+                return
+            on_finished(algo_run_id)
+
+        def failed(msg: str):
+            self.__pending_jobs.discard(job)
+            if session == self.__session:
+                self.view.show_error(msg)
+
+        job.finished.connect(finished)
+        job.failed.connect(failed)
+
+    def __start_new_session(self):
+        self.__session += 1
+        for job in self.__pending_jobs:
+            job.cancel()
+        self.__pending_jobs.clear()
+        self.__pending_reruns.clear()
+
+    def __algo_rerun_finished(self, algo_run_id: uuid, next_algo_run_id: uuid):
+        # Tab of the previous run may be closed while the rerun was running
+        if algo_run_id not in self.model.algo_run_results:
+            self.model.remove_algo_run_results(next_algo_run_id)
+            return
+        self.model.remove_algo_run_results(algo_run_id)
+        self.view.change_algo_run_results(algo_run_id, next_algo_run_id)
 
     def add_algo_run_pushed(self):
         algo_run_config = self.view.show_add_algo_run_dialog(algo_ids=self.model.algorithms.keys())
         if algo_run_config is None:
             return
         try:
-            algo_run_id = self.model.add_algo_run(algo_run_config)
-            self.view.add_algo_run_results(algo_run_id)
+            job = self.model.submit_algo_run(algo_run_config)
         except (KeyError, ValueError, TypeError, OverflowError) as err:
             self.view.show_error(str(err))
+            return
+        self.__track_job(job, self.view.add_algo_run_results)
 
     def add_algo_config_pushed(self) -> uuid:
         self.view.show_add_algo_config(self.model.algorithms.keys())
 
-    def launch_algo_run(self, algo_run_config):
-        try:
-            return self.model.add_algo_run(algo_run_config)
-        except:
-            return None
+    def launch_algo_matrix(self, dataset_ids: [uuid], algo_configs: [AlgoConfig], score_id: uuid):
+        return self.model.submit_algo_matrix(dataset_ids, algo_configs, [score_id])
+
+    def launch_sweep(self, dataset_ids: [uuid], sweep: SweepConfig, score_id: uuid):
+        """
+        :return: tuple (configurations of the sweep, jobs by (dataset_id, index of configuration))
+        """
+        algo_configs = sweep.expand()
+        return algo_configs, self.model.submit_algo_matrix(dataset_ids, algo_configs, [score_id])
+
+    def launch_halving_search(self, dataset_ids: [uuid], sweep: SweepConfig, score_id: uuid):
+        """
+        Starts successive halving over the configurations of the sweep on each dataset.
+
+        :return: tuple (configurations of the sweep, searches by dataset_id)
+        """
+        algo_configs = sweep.expand()
+        searches = {}
+        for dataset_id in dataset_ids:
+            searches[dataset_id] = HalvingSearch(self.model, dataset_id, algo_configs, score_id)
+            searches[dataset_id].start()
+        return algo_configs, searches
+
+    def discard_algo_run(self, algo_run_id: uuid):
+        """
+        Removes results, that are not shown anywhere (e.g. not the best runs of a sweep), to free memory.
+        """
+        self.model.remove_algo_run_results(algo_run_id)
 
     def remove_algo_run_pushed(self, algorithm_id: uuid):
         if self.model.remove_algo_run_results(algorithm_id):
@@ -122,67 +217,72 @@ class Presenter:
             os.remove(new_file)
             self.view.show_error(f"Variable 'algorithms' was not found in file!")
 
-    def __add_dataset(self, dataset: Dataset):
+    def __add_dataset(self, store_dataset: Callable[[], Dataset]):
+        """
+        :param store_dataset: adds the dataset to the library and returns it
+        """
         try:
-            add_dataset(dataset)
-            dataset_id = self.model.add_dataset(dataset)
-            self.view.add_dataset(dataset_id)
+            dataset = store_dataset()
         except DuplicatedDatasetNameError:
             self.view.show_error("Dataset with this name already exists; please, try again with another name")
+            return
+        except (ValueError, OSError) as err:
+            self.view.show_error(str(err))
+            return
+        dataset_id = self.model.add_dataset(dataset)
+        self.view.add_dataset(dataset_id)
 
     def add_dataset_pushed(self):
         file = self.view.show_open_file_dialog("Load new dataset", "*.csv")
         if not file:
             return
 
-        df = load_from_csv(file)
+        # Only a sample is read to show the columns, the whole file is read by chunks while importing
+        df = load_csv_sample(file)
         result = self.view.show_add_dataset_dialog(get_feature_cols(df).columns.tolist(),
                                                    get_cols_with_type(df, ['object']).columns.tolist())
         if result is None:
             return
 
-        data = df[result.included_cols].to_numpy()
-        if result.normalise:
-            data = normalise_dataset(data)
-        titles = None if result.title_col is None else df[result.title_col].to_numpy()
-
-        dataset = Dataset(
-            data=data,
-            num_of_classes=None,
-            target=None,
-            feature_names=result.included_cols,
-            name=result.name,
-            titles=titles
-        )
-        self.__add_dataset(dataset)
+        self.__add_dataset(partial(import_from_csv, file,
+                                   name=result.name,
+                                   feature_cols=result.included_cols,
+                                   title_col=result.title_col,
+                                   normalise=result.normalise))
 
     def generate_new_dataset_pushed(self):
         params = self.view.show_generate_dataset_dialog()
         if params is None:
             return
-        dataset = generate_random_dataset(
-            name=params.name,
-            n_samples=params.n_samples,
-            num_of_classes=params.num_of_classes,
-            n_features=params.n_features,
-            cluster_std=params.cluster_std
-        )
-        self.__add_dataset(dataset)
+
+        def store_generated_dataset() -> Dataset:
+            dataset = generate_random_dataset(
+                name=params.name,
+                n_samples=params.n_samples,
+                num_of_classes=params.num_of_classes,
+                n_features=params.n_features,
+                cluster_std=params.cluster_std
+            )
+            add_dataset(dataset)
+            return dataset
+
+        self.__add_dataset(store_generated_dataset)
 
     def change_cur_dataset(self, dataset_id):
         self.view.change_cur_dataset(dataset_id)
 
     def save_session_pushed(self):
-        file = self.view.show_save_file_dialog("Save session", "*.ini")
+        file = self.view.show_save_file_dialog("Save session", "*.json")
         if not file:
             return
         self.model.save(file)
 
     def load_session_pushed(self):
-        file = self.view.show_open_file_dialog("Load session", "*.ini")
+        file = self.view.show_open_file_dialog("Load session", "*.json *.ini")
         if not file:
             return
         self.model.save()
+        self.__start_new_session()
         self.model.algo_run_results.clear()
         self.model.load_from_file(file)
         self.view.load_from_model(self.model)
@@ -191,6 +291,7 @@ class Presenter:
         self.model.save()
         dialog = SelectModeDialog()
         if dialog.exec():
+            self.__start_new_session()
             self.model.reload(dialog.get_result())
             self.view.load_from_model(self.model)
         else:
@@ -203,12 +304,17 @@ class Presenter:
         results = self.get_algo_run_results(algo_run_id)
         dataset = self.model.datasets[results.config.dataset_id]
 
-        #print(np.shape(dataset.data)[1])
-        data = np.append(np.array(dataset.titles)[np.newaxis].T, dataset.data, 1)
-        data = np.append(data, np.array(results.pred)[np.newaxis].T, 1)
-        col_names = ["Name"] + copy(dataset.feature_names) + ["Cluster"]
-        df = pandas.DataFrame(data=data, columns=col_names)
-        df.to_csv(file, index=False)
+        rows = write_csv_chunks(file,
+                                header=["Name"] + list(dataset.feature_names) + ["Cluster"],
+                                columns=[dataset.titles, dataset.data, results.pred])
+        try:
+            completed = self.view.show_progress("Exporting results...", len(results.pred), rows)
+        except OSError as err:
+            completed = False
+            self.view.show_error(str(err))
+        if not completed and os.path.exists(file):
+            os.remove(file)
 
     def close_listener(self):
         self.model.save()
+        self.model.shutdown()
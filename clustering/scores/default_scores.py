@@ -1,43 +1,117 @@
-import sklearn.metrics as sm
 import numpy as np
 import math
+import typing
 
-from clustering.model.Score import Score
+from clustering.model.Algorithm import INCREMENTAL_CHUNK_SIZE
+from clustering.model.Score import Score, Intermediate
 
+if typing.TYPE_CHECKING:
+    import scipy.sparse
 
-def get_intersection_table(target: list[int], pred: list[int]):
-    n = len(target)
-    r = max(target) + 1
-    s = max(pred) + 1
-    m = np.zeros((r, s))
-    for i in range(n):
-        m[target[i]][pred[i]] += 1
-    return m
 
+# Scores that need target take contingency table of (target, pred), see `clustering.model.Score.contingency_table`.
+# Rows of the table correspond to classes and columns correspond to clusters.
+# Other scores take (data, pred) and intermediates, that they require.
 
-def minkowski_score(target: list[int], pred: list[int]):
-    m = get_intersection_table(target, pred)
-    a = list(map(sum, m))
-    b = list(map(sum, np.swapaxes(m, 0, 1)))
-    sa = sum(map(lambda el: el * (el - 1) / 2, a))
-    sb = sum(map(lambda el: el * (el - 1) / 2, b))
-    sn = sum(map(lambda el: el * (el - 1) / 2, np.ravel(m)))
+def _pair_confusion(m: 'scipy.sparse.csr_matrix') -> (float, float, float, float):
+    """
+    :return: numbers of ordered pairs of points (tn, fp, fn, tp), where positive means "in the same cluster" and
+    true means "prediction agrees with target"
+    """
+    n = float(m.sum())
+    class_sizes = np.ravel(m.sum(axis=1)).astype(float)
+    cluster_sizes = np.ravel(m.sum(axis=0)).astype(float)
+    sum_squares = (m.data.astype(float) ** 2).sum()
+    tp = sum_squares - n
+    fp = m.dot(cluster_sizes).sum() - sum_squares
+    fn = m.T.dot(class_sizes).sum() - sum_squares
+    tn = n ** 2 - fp - fn - sum_squares
+    return tn, fp, fn, tp
+
+
+def rand_score(m: 'scipy.sparse.csr_matrix'):
+    tn, fp, fn, tp = _pair_confusion(m)
+    numerator = tn + tp
+    denominator = tn + fp + fn + tp
+    if numerator == denominator or denominator == 0:
+        return 1.0
+    return numerator / denominator
+
+
+def adjusted_rand_score(m: 'scipy.sparse.csr_matrix'):
+    tn, fp, fn, tp = _pair_confusion(m)
+    if fn == 0 and fp == 0:
+        return 1.0
+    return 2.0 * (tp * tn - fn * fp) / ((tp + fn) * (fn + tn) + (tp + fp) * (fp + tn))
+
+
+def fowlkes_mallows_score(m: 'scipy.sparse.csr_matrix'):
+    n = float(m.sum())
+    tk = (m.data.astype(float) ** 2).sum() - n
+    pk = (np.ravel(m.sum(axis=0)).astype(float) ** 2).sum() - n
+    qk = (np.ravel(m.sum(axis=1)).astype(float) ** 2).sum() - n
+    return math.sqrt(tk / pk) * math.sqrt(tk / qk) if tk != 0.0 else 0.0
+
+
+def completeness_score(m: 'scipy.sparse.csr_matrix'):
+    n = float(m.sum())
+    class_sizes = np.ravel(m.sum(axis=1)).astype(float)
+    cluster_sizes = np.ravel(m.sum(axis=0)).astype(float)
+    cluster_p = cluster_sizes / n
+    cluster_entropy = -(cluster_p * np.log(cluster_p)).sum()
+    if cluster_entropy == 0:
+        return 1.0
+    coo = m.tocoo()
+    nij = coo.data.astype(float)
+    mutual_info = (nij / n * (np.log(nij) + math.log(n) - np.log(class_sizes[coo.row])
+                              - np.log(cluster_sizes[coo.col]))).sum()
+    return max(mutual_info, 0.0) / cluster_entropy
+
+
+def _pairs_count(sizes: np.ndarray):
+    sizes = sizes.astype(float)
+    return (sizes * (sizes - 1) / 2).sum()
+
+
+def minkowski_score(m: 'scipy.sparse.csr_matrix'):
+    sa = _pairs_count(np.ravel(m.sum(axis=1)))
+    sb = _pairs_count(np.ravel(m.sum(axis=0)))
+    sn = _pairs_count(m.data)
     return math.sqrt(sa + sb - 2 * sn) / math.sqrt(sb)
 
 
-def purity_score(target: list[int], pred: list[int]):
-    n = len(target)
-    m = get_intersection_table(target, pred)
-    return sum(map(max, m)) / n
+def purity_score(m: 'scipy.sparse.csr_matrix'):
+    return m.max(axis=1).sum() / m.sum()
+
+
+def calinski_harabasz_score(data: np.ndarray, pred: np.ndarray, centroids: np.ndarray, cluster_sizes: np.ndarray):
+    n, k = data.shape[0], cluster_sizes.shape[0]
+    if not 1 < k < n:
+        raise ValueError(f"Number of labels is {k}. Valid values are 2 to n_samples - 1 (inclusive)")
+    cluster_idx = np.unique(pred, return_inverse=True)[1].ravel()
+    mean = cluster_sizes @ centroids / n
+    extra_disp = (cluster_sizes * ((centroids - mean) ** 2).sum(axis=1)).sum()
+    # Data may be memory-mapped, so the dispersion is summed up by chunks of rows
+    intra_disp = sum(((np.asarray(data[start:start + INCREMENTAL_CHUNK_SIZE])
+                       - centroids[cluster_idx[start:start + INCREMENTAL_CHUNK_SIZE]]) ** 2).sum()
+                     for start in range(0, n, INCREMENTAL_CHUNK_SIZE))
+    return 1.0 if intra_disp == 0.0 else extra_disp * (n - k) / (intra_disp * (k - 1.0))
+
+
+def silhouette_score(data: np.ndarray, pred: np.ndarray, pairwise_distances: np.ndarray):
+    import sklearn.metrics as sm
+    # Distances may be a memory-mapped float32 matrix, the score is returned as python float anyway
+    return float(sm.silhouette_score(pairwise_distances, pred, metric='precomputed'))
 
 
 scores = [
-    Score("Rand", sm.rand_score, True),
-    Score("Adjusted rand", sm.rand_score, True),
-    Score("Fowlkes-Mallows", sm.fowlkes_mallows_score, True),
-    Score("Completeness", sm.completeness_score, True),
-    Score("Calinski-Harabasz", sm.calinski_harabasz_score, False),
-    Score("Silhouette", sm.silhouette_score, False),
-    Score("Minkowski", minkowski_score, True),
+    Score("Rand", rand_score, True),
+    Score("Adjusted rand", adjusted_rand_score, True),
+    Score("Fowlkes-Mallows", fowlkes_mallows_score, True),
+    Score("Completeness", completeness_score, True),
+    Score("Calinski-Harabasz", calinski_harabasz_score, False,
+          requires=[Intermediate.Centroids, Intermediate.ClusterSizes]),
+    Score("Silhouette", silhouette_score, False, requires=[Intermediate.PairwiseDistances], approximate=True),
+    Score("Minkowski", minkowski_score, True, greater_is_better=False),
     Score("Purity", purity_score, True)
 ]
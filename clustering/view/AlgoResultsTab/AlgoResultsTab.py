@@ -1,9 +1,12 @@
 import uuid
 
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QWidget, QGridLayout, QFormLayout, QLabel, QGroupBox, QVBoxLayout, QPushButton, QDialog, \
-    QTableWidget, QTableWidgetItem, QScrollArea
+    QTableView, QHeaderView, QScrollArea
 
+from clustering.model.Score import ScoreEstimate
 from clustering.view.AlgoResultsTab.ClusteringView import ClusteringView
+from clustering.view.AlgoResultsTab.ResultsTableModel import ResultsTableModel
 from clustering.presenter.Presenter import Presenter
 from clustering.view.AlgoParamsSetter import AlgoParamsSetter
 
@@ -16,9 +19,17 @@ class ScoresWidget(QScrollArea):
         layout.setVerticalSpacing(20)
         layout.setHorizontalSpacing(50)
         for score_name in scores.keys():
-            layout.addRow(QLabel(f"{score_name}: "), QLabel(str(scores[score_name])))
+            layout.addRow(QLabel(f"{score_name}: "), self.__create_value_label(scores[score_name]))
         self.setWidget(widget)
 
+    @staticmethod
+    def __create_value_label(value):
+        if not isinstance(value, ScoreEstimate):
+            return QLabel(str(value))
+        label = QLabel(f"≈ {float(value)} (95% CI: [{value.low:.4f}, {value.high:.4f}])")
+        label.setToolTip("Estimated on subsamples of the dataset")
+        return label
+
 
 class AlgoResultsTab(QWidget):
     def __init__(self, presenter: Presenter, algo_run_id: uuid):
@@ -36,7 +47,7 @@ class AlgoResultsTab(QWidget):
             values=algo_run_results.config.algo_config.params
         )
         self.scores_widget = ScoresWidget(algo_run_results.scores)
-        self.clustering_view = ClusteringView(self.points, self.pred, self.presenter, algo_run_results.config.dataset_id)
+        self.clustering_view = ClusteringView(self.pred, self.presenter, algo_run_results.config.dataset_id)
         self.show_in_analytic_mode_button = QPushButton("Show table")
         self.show_in_analytic_mode_button.clicked.connect(self.show_in_analytic_mode_listener)
         self.rerun_button = QPushButton("Rerun algorithm")
@@ -50,10 +61,17 @@ class AlgoResultsTab(QWidget):
         self.setLayout(layout)
 
     def rerun_algo_button_listener(self):
-        self.presenter.rerun_algo_pushed(
+        job = self.presenter.rerun_algo_pushed(
             algo_run_id=self.algo_run_id,
             params=self.parameters_widget.get_params()
         )
+        if job is not None:
+            # On success the tab is replaced with the results of the rerun
+            self.rerun_button.setEnabled(False)
+            job.failed.connect(self.__rerun_failed)
+
+    def __rerun_failed(self, msg: str):
+        self.rerun_button.setEnabled(True)
 
     def export_results_button_listener(self):
         self.presenter.export_algo_run_results(self.algo_run_id)
@@ -63,17 +81,20 @@ class AlgoResultsTab(QWidget):
         dialog.setWindowTitle("Results")
         dialog.setMinimumSize(800, 700)
         layout = QVBoxLayout()
-        table = QTableWidget(len(self.points), len(self.feature_names) + 2)
-        table.setHorizontalHeaderItem(0, QTableWidgetItem("Name"))
-        for i, title in enumerate(self.feature_names):
-            table.setHorizontalHeaderItem(i + 1, QTableWidgetItem(title))
-        table.setHorizontalHeaderItem(len(self.feature_names) + 1, QTableWidgetItem("Cluster"))
-        for i, point in enumerate(self.points):
-            info = self.presenter.get_dataset_titles(self.dataset_id)[i]
-            table.setItem(i, 0, QTableWidgetItem(info))
-            for j, val in enumerate(point):
-                table.setItem(i, j + 1, QTableWidgetItem("{:.4f}".format(val)))
-            table.setItem(i, len(point) + 1, QTableWidgetItem(str(self.pred[i])))
+        model = ResultsTableModel(
+            titles=self.presenter.get_dataset_titles(self.dataset_id),
+            data=self.points,
+            pred=self.pred,
+            feature_names=self.feature_names
+        )
+        table = QTableView()
+        table.setModel(model)
+        # Rows have the same height, so it isn't calculated for each row
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        # Enabling sorting sorts rows by the indicated column at once, so no column is indicated until the user
+        # clicks on a header
+        table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        table.setSortingEnabled(True)
         export_button = QPushButton("Export to csv")
         export_button.clicked.connect(self.export_results_button_listener)
         layout.addWidget(table)
@@ -1,16 +1,13 @@
-import cmapy
 import random
 import uuid
 
 import numpy as np
-from PyQt5.QtCore import Qt, QPointF, QRect
-from PyQt5.QtGui import QColor, QBrush, QPen
-from PyQt5.QtWidgets import QWidget, QGraphicsScene, QGraphicsView, QGraphicsItem, QSizePolicy, QGraphicsEllipseItem, \
-    QGraphicsTextItem
+from PyQt5.QtGui import QColor, QBrush, QResizeEvent
+from PyQt5.QtWidgets import QWidget, QGraphicsScene, QGraphicsView, QSizePolicy, QGraphicsTextItem
 from PyQt5.QtGui import QTransform
-from sklearn.decomposition import PCA
 
 from clustering.presenter.Presenter import Presenter
+from clustering.view.AlgoResultsTab.PointCloudItem import PointCloudItem
 
 
 class ScalableGraphicsView(QGraphicsView):
@@ -19,6 +16,7 @@ class ScalableGraphicsView(QGraphicsView):
         self.setDragMode(QGraphicsView.ScrollHandDrag)
         self.setSizePolicy(QSizePolicy(QSizePolicy.Maximum, QSizePolicy.Maximum))
         self.zoom = 1
+        self.base_scale = 1
         self.info = self.hint_bg = None
 
     def wheelEvent(self, event):
@@ -29,8 +27,16 @@ class ScalableGraphicsView(QGraphicsView):
             self.zoom = max(0.2, self.zoom / 1.12)
         self.__update_view()
 
+    def fit(self, width: float, height: float):
+        """
+        Scales the view, so that rectangle width x height in scene coordinates fits the view at zoom 1.
+        """
+        self.base_scale = min(self.width() / width, self.height() / height)
+        self.__update_view()
+
     def __update_view(self):
-        self.setTransform(QTransform().scale(self.zoom, self.zoom))
+        scale = self.base_scale * self.zoom
+        self.setTransform(QTransform().scale(scale, scale))
 
     def __reset_info(self):
         if self.info is not None:
@@ -52,51 +58,38 @@ class ScalableGraphicsView(QGraphicsView):
         super().mousePressEvent(event)
 
 
-class EllipseWithInfo(QGraphicsEllipseItem):
-    def __init__(self, view: ScalableGraphicsView, x: float, y: float, w: float, h: float, pen: QPen, brush: QBrush, info: str):
-        super().__init__(x, y, w, h)
-        self.ax = x
-        self.ay = y
-        self.view = view
-        self.setPen(pen)
-        self.setBrush(brush)
-        self.info = info
-
-    def mousePressEvent(self, event):
-        super().mousePressEvent(event)
-        self.view.add_info(self.info, self.ax + 10, self.ay + 10)
-
-
 class ClusteringView(QWidget):
-    def __init__(self, points: np.ndarray, pred: np.ndarray, presenter: Presenter, dataset_id: uuid):
+    # Size of the rectangle in scene coordinates, into which points are fitted
+    SCENE_WIDTH = 800
+    SCENE_HEIGHT = 600
+
+    def __init__(self, pred: np.ndarray, presenter: Presenter, dataset_id: uuid):
         super().__init__()
         scene = QGraphicsScene()
-        if points.shape[1] != 2:
-            points = PCA(n_components=2).fit_transform(points)
-        self.points = list(map(lambda point: QPointF(point[0], point[1]), points))
+        self.points = None
         self.presenter = presenter
         self.dataset_id = dataset_id
         self.pred = pred
         self.graphicView = ScalableGraphicsView(scene, self)
         self.setMinimumSize(800, 600)
         self.graphicView.setMinimumSize(800, 600)
+        import cmapy
         self.colors = {x: QColor(*cmapy.color('hsv', random.randrange(0, 256), rgb_order=True)) for x in set(pred)}
 
+        # Projection is shared by all views of the dataset, points are shown when it is calculated
+        self.presenter.request_dataset_projection(dataset_id, self.set_points)
+
+    def set_points(self, points: np.ndarray):
+        self.points = self.__normalize_points(np.asarray(points, dtype=np.float64))
         self.graphicView.setScene(self.get_scene_with_points())
 
     def get_scene_with_points(self):
         scene = QGraphicsScene()
-        points = self.resize_points()
-        for idx, point in enumerate(points):
-            ellipse = EllipseWithInfo(self.graphicView, point.x(), point.y(), 10, 10,
-                                      QPen(self.colors[self.pred[idx]], 3, Qt.SolidLine),
-                                      QBrush(self.colors[self.pred[idx]]), self.get_point_info(idx))
-            ellipse.setFlag(QGraphicsItem.ItemIsSelectable)
-            scene.addItem(ellipse)
+        scene.addItem(PointCloudItem(self.points, self.pred, self.colors, 10,
+                                     on_click=self.__show_point_info, point_info=self.get_point_info))
 
         rect = scene.sceneRect()
-        width = self.graphicView.width()
-        height = self.graphicView.height()
+        width, height = self.SCENE_WIDTH, self.SCENE_HEIGHT
         rect.adjust(-1.5 * width, -1.5 * height, 1.5 * width, 1.5 * height)
         scene.setSceneRect(rect)
         return scene
@@ -109,17 +102,24 @@ class ClusteringView(QWidget):
             info += f"{feature_names[feature_id]} = {data[idx][feature_id]}\n"
         return info
 
-    def resize_points(self):
-        minW = min(x.x() for x in self.points)
-        maxW = max(x.x() for x in self.points)
-        minH = min(x.y() for x in self.points)
-        maxH = max(x.y() for x in self.points)
-        width = self.graphicView.width()
-        height = self.graphicView.height()
-        k = min(width / (maxW - minW), height / (maxH - minH))
-        return (QPointF(k * (x.x() - minW), k * (x.y() - minH)) for x in self.points)
-
-    def setGeometry(self, a0: QRect):
-        super().setGeometry(a0)
-        self.graphicView.setGeometry(0, 0, a0.width(), a0.height())
-        self.graphicView.setScene(self.__get_scene_with_points())
+    def __show_point_info(self, idx: int):
+        x, y = self.points[idx]
+        self.graphicView.add_info(self.get_point_info(idx), x + 10, y + 10)
+
+    def __normalize_points(self, points: np.ndarray) -> np.ndarray:
+        """
+        :return: points shifted and scaled to fit the rectangle SCENE_WIDTH x SCENE_HEIGHT
+        """
+        if len(points) == 0:
+            return points
+        min_point = points.min(axis=0)
+        extent = points.max(axis=0) - min_point
+        extent[extent == 0] = 1
+        k = min(self.SCENE_WIDTH / extent[0], self.SCENE_HEIGHT / extent[1])
+        return k * (points - min_point)
+
+    def resizeEvent(self, event: QResizeEvent):
+        # Layouts don't call overridden setGeometry, so the view is resized here
+        super().resizeEvent(event)
+        self.graphicView.setGeometry(0, 0, event.size().width(), event.size().height())
+        self.graphicView.fit(self.SCENE_WIDTH, self.SCENE_HEIGHT)
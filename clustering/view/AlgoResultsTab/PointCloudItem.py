@@ -0,0 +1,130 @@
+import math
+from collections.abc import Callable
+
+import numpy as np
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QPen, QPolygonF
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+
+def _to_polygon(points: np.ndarray) -> QPolygonF:
+    polygon = QPolygonF(points.shape[0])
+    # QPolygonF stores points as consecutive pairs of doubles, so the coordinates are copied right into its buffer
+    buffer = polygon.data()
+    buffer.setsize(points.shape[0] * 2 * np.dtype(np.float64).itemsize)
+    np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)[:] = points
+    return polygon
+
+
+class PointCloudItem(QGraphicsItem):
+    """
+    This class is used to draw all points of the clustering with one graphics item.
+
+    Points that fall into the same cell of about CELL_PIXELS pixels are covered by the one drawn last, so only that
+    point is drawn. Indices of such representatives are calculated once for each level of detail (cell size 2^level).
+    """
+    MIN_LEVEL = -4
+    CELL_PIXELS = 2
+
+    def __init__(self, points: np.ndarray, labels: np.ndarray, colors: dict, point_size: float,
+                 on_click: Callable[[int], None] = None, point_info: Callable[[int], str] = None):
+        """
+        :param points: array with shape (n_points, 2) with coordinates of points in the scene
+        :param labels: cluster of each point
+        :param colors: color for each cluster
+        :param on_click: function, that is called with index of the clicked point
+        :param point_info: function, that returns tooltip for the point with given index
+        """
+        super().__init__()
+        self.on_click = on_click
+        self.point_info = point_info
+        self.__tree = None
+        self.__hovered = None
+        self.setAcceptHoverEvents(point_info is not None)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        # Panning only moves the cached image instead of repainting all points
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        clusters, label_idx = np.unique(labels, return_inverse=True)
+        # Points are sorted by cluster, so that any sorted subset of them is grouped by cluster
+        self.order = np.argsort(label_idx, kind='stable')
+        self.points = np.ascontiguousarray(points[self.order], dtype=np.float64)
+        self.label_idx = label_idx[self.order]
+        self.pens = [QPen(colors[cluster], point_size, Qt.SolidLine, Qt.RoundCap) for cluster in clusters]
+        self.point_size = point_size
+        self.__levels: dict[int, np.ndarray] = {}
+        if len(self.points) == 0:
+            self.__rect = QRectF()
+        else:
+            (min_x, min_y), (max_x, max_y) = self.points.min(axis=0), self.points.max(axis=0)
+            self.__rect = QRectF(min_x, min_y, max_x - min_x, max_y - min_y)\
+                .adjusted(-point_size, -point_size, point_size, point_size)
+
+    def boundingRect(self) -> QRectF:
+        return self.__rect
+
+    def __get_level(self, level: int) -> np.ndarray:
+        """
+        :return: sorted indices of points, one for each cell
+        """
+        if level not in self.__levels:
+            cells = np.floor((self.points - self.points.min(axis=0)) / 2.0 ** level).astype(np.int64)
+            n_rows, n_labels = cells[:, 1].max() + 1, len(self.pens)
+            keys, first = np.unique((cells[:, 0] * n_rows + cells[:, 1]) * n_labels + self.label_idx,
+                                    return_index=True)
+            # Clusters are painted in ascending order, so the point of the last cluster in each cell is kept
+            cells = keys // n_labels
+            last_in_cell = np.append(cells[1:] != cells[:-1], True)
+            self.__levels[level] = np.sort(first[last_in_cell])
+        return self.__levels[level]
+
+    def visible_points(self, rect: QRectF, pixel_size: float) -> np.ndarray:
+        """
+        :return: sorted indices of points, that should be drawn in rect when one pixel has size pixel_size
+        """
+        level = math.floor(math.log2(self.CELL_PIXELS * pixel_size)) if pixel_size > 0 else self.MIN_LEVEL - 1
+        idx = np.arange(len(self.points)) if level < self.MIN_LEVEL else self.__get_level(level)
+        margin = self.point_size
+        points = self.points[idx]
+        inside = (points[:, 0] >= rect.left() - margin) & (points[:, 0] <= rect.right() + margin) & \
+                 (points[:, 1] >= rect.top() - margin) & (points[:, 1] <= rect.bottom() + margin)
+        return idx[inside]
+
+    def paint(self, painter, option: QStyleOptionGraphicsItem, widget=None):
+        if len(self.points) == 0:
+            return
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        idx = self.visible_points(option.exposedRect, 1 / lod if lod > 0 else 0)
+        bounds = np.searchsorted(self.label_idx[idx], np.arange(len(self.pens) + 1))
+        for label, pen in enumerate(self.pens):
+            if bounds[label] == bounds[label + 1]:
+                continue
+            painter.setPen(pen)
+            painter.drawPoints(_to_polygon(self.points[idx[bounds[label]:bounds[label + 1]]]))
+
+    def point_at(self, x: float, y: float):
+        """
+        :return: index (in the original order) of the point drawn at (x, y) or None
+        """
+        if len(self.points) == 0:
+            return None
+        if self.__tree is None:
+            from scipy.spatial import cKDTree
+            self.__tree = cKDTree(self.points)
+        distance, nearest = self.__tree.query((x, y), distance_upper_bound=self.point_size / 2)
+        if math.isinf(distance):
+            return None
+        return int(self.order[nearest])
+
+    def mousePressEvent(self, event):
+        idx = self.point_at(event.pos().x(), event.pos().y())
+        if idx is None or self.on_click is None:
+            # Click on empty space is passed to the view (e.g. for dragging)
+            event.ignore()
+            return
+        self.on_click(idx)
+
+    def hoverMoveEvent(self, event):
+        idx = self.point_at(event.pos().x(), event.pos().y())
+        if idx != self.__hovered:
+            self.__hovered = idx
+            self.setToolTip("" if idx is None else self.point_info(idx))
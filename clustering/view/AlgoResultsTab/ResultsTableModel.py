@@ -0,0 +1,63 @@
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """
+    Table with title, features and cluster of each point. Cells are formatted only when they are shown,
+    so the table works for datasets of any size.
+
+    Rows are sorted through the permutation, that is calculated by argsort once for each column.
+    """
+
+    def __init__(self, titles: np.ndarray, data: np.ndarray, pred: np.ndarray, feature_names: [str]):
+        super().__init__()
+        self.titles = titles
+        self.points = data
+        self.pred = pred
+        self.headers = ["Name"] + list(feature_names) + ["Cluster"]
+        self.__order = None
+        self.__orders: dict[int, np.ndarray] = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.pred)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section: int, orientation, role: int = Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(self.__row(section) + 1)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row, column = self.__row(index.row()), index.column()
+        if column == 0:
+            return str(self.titles[row])
+        if column == len(self.headers) - 1:
+            return str(self.pred[row])
+        return "{:.4f}".format(self.points[row, column - 1])
+
+    def __row(self, row: int) -> int:
+        return row if self.__order is None else int(self.__order[row])
+
+    def __column_values(self, column: int) -> np.ndarray:
+        if column == 0:
+            return np.asarray(self.titles)
+        if column == len(self.headers) - 1:
+            return np.asarray(self.pred)
+        return np.asarray(self.points[:, column - 1])
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        if column < 0:
+            self.__order = None
+        else:
+            if column not in self.__orders:
+                self.__orders[column] = np.argsort(self.__column_values(column), kind='stable')
+            self.__order = self.__orders[column] if order == Qt.AscendingOrder else self.__orders[column][::-1]
+        self.layoutChanged.emit()
@@ -8,6 +8,9 @@ from clustering.model.Model import AlgoConfig
 from clustering.presenter.Presenter import Presenter
 from clustering.view.AddAlgoRunDialog import AddAlgoRunDialog
 from clustering.view.AlgoCompareWidget import AlgoCompareWidget
+from clustering.view.HalvingResultsDialog import HalvingResultsDialog
+from clustering.view.SweepDialog import SweepDialog
+from clustering.view.SweepResultsDialog import SweepResultsDialog
 from clustering.view.WidgetHelper import WidgetHelper
 
 
@@ -23,12 +26,21 @@ class CompareModeWidget(QWidget, WidgetHelper):
 
         self.go_btn = QPushButton("Show results")
         self.go_btn.clicked.connect(self.launch_all)
+        self.sweep_btn = QPushButton("Sweep parameters")
+        self.sweep_btn.clicked.connect(self.launch_sweep)
+        self.halving_btn = QPushButton("Successive halving")
+        self.halving_btn.clicked.connect(self.launch_halving_search)
 
         layout = QVBoxLayout()
         layout.addWidget(self.dataset_selector)
         layout.addWidget(self.add_title_to_widget("Select scoring:", self.score_selector))
         layout.addWidget(self.add_title_to_widget("Added configurations:", self.__create_algo_configs()))
-        layout.addWidget(self.go_btn)
+        buttons = QFrame()
+        buttons.setLayout(QHBoxLayout())
+        buttons.layout().addWidget(self.go_btn)
+        buttons.layout().addWidget(self.sweep_btn)
+        buttons.layout().addWidget(self.halving_btn)
+        layout.addWidget(buttons)
         self.setLayout(layout)
 
     def __create_algo_configs(self):
@@ -110,6 +122,21 @@ class CompareModeWidget(QWidget, WidgetHelper):
         dialog = AlgoCompareWidget(self.presenter, self.included_datasets, algo_configs_list, self.use_score)
         dialog.exec()
 
+    def launch_sweep(self):
+        sweep_dialog = SweepDialog(self, self.presenter, self.presenter.get_algo_ids())
+        if sweep_dialog.exec():
+            dialog = SweepResultsDialog(self.presenter, self.included_datasets, sweep_dialog.get_result(),
+                                        self.use_score)
+            dialog.exec()
+
+    def launch_halving_search(self):
+        sweep_dialog = SweepDialog(self, self.presenter, self.presenter.get_algo_ids(), "Successive halving",
+                                   early_stopping=False)
+        if sweep_dialog.exec():
+            dialog = HalvingResultsDialog(self.presenter, self.included_datasets, sweep_dialog.get_result(),
+                                          self.use_score)
+            dialog.exec()
+
     def add_results_tab(self, algo_run_id):
         pass
 
@@ -0,0 +1,95 @@
+import math
+import uuid
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QTableWidget, QVBoxLayout, QTableWidgetItem, QAbstractItemView, QLabel, QWidget
+
+from clustering.model.HalvingSearch import HalvingSearch
+from clustering.model.Sweep import SweepConfig
+from clustering.presenter.Presenter import Presenter
+from clustering.view.ResultsDialog import NumericItem, ResultsDialog
+
+
+class HalvingResultsDialog(ResultsDialog):
+    """
+    Shows scores of each configuration in each rung of successive halving, configurations are sorted by their
+    score in the last rung they reached.
+    """
+
+    def __init__(self, presenter: Presenter, dataset_ids: [uuid], sweep: SweepConfig, score_id: uuid):
+        super().__init__(presenter)
+        self.setWindowTitle(f"Successive halving: {sweep.name}")
+        self.setMinimumSize(800, 600)
+        self.score_name = presenter.get_score_name(score_id)
+        self.greater_is_better = presenter.is_score_greater_better(score_id)
+
+        self.algo_configs, self.searches = presenter.launch_halving_search(list(dataset_ids), sweep, score_id)
+        self.jobs.extend(self.searches.values())
+        self.tables: dict[uuid, QTableWidget] = {}
+        self.statuses: dict[uuid, QLabel] = {}
+        layout = QVBoxLayout()
+        for dataset_id, search in self.searches.items():
+            widget = QWidget()
+            widget.setLayout(QVBoxLayout())
+            self.statuses[dataset_id] = QLabel()
+            self.tables[dataset_id] = self.__generate_table(search)
+            widget.layout().addWidget(self.statuses[dataset_id])
+            widget.layout().addWidget(self.tables[dataset_id])
+            layout.addWidget(self.add_title_to_widget(presenter.get_dataset_name(dataset_id), widget))
+            search.evaluated.connect(lambda ind, rung, score, dataset_id=dataset_id:
+                                     self.__run_finished(dataset_id, ind, rung, score))
+            search.finished.connect(lambda _, dataset_id=dataset_id: self.__update_status(dataset_id))
+            self.__update_status(dataset_id)
+        self.setLayout(layout)
+
+    def __generate_table(self, search: HalvingSearch):
+        table = QTableWidget(len(self.algo_configs), len(search.schedule) + 1)
+        table.setHorizontalHeaderItem(0, QTableWidgetItem('Configuration'))
+        for rung, (_, size) in enumerate(search.schedule):
+            table.setHorizontalHeaderItem(rung + 1, QTableWidgetItem(f'{self.score_name} ({size} points)'))
+        for ind, algo_config in enumerate(self.algo_configs):
+            name_item = QTableWidgetItem(algo_config.name)
+            name_item.setData(Qt.UserRole, ind)
+            table.setItem(ind, 0, name_item)
+            for column in range(1, table.columnCount()):
+                table.setItem(ind, column, NumericItem(''))
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.itemDoubleClicked.connect(self.show_algo_run)
+        return table
+
+    def __update_status(self, dataset_id: uuid):
+        search = self.searches[dataset_id]
+        saved = 1 - search.clustered_points / search.full_grid_points()
+        status = f"Rung {len(search.rungs)} of {len(search.schedule)}: " \
+                 f"{len(search.rungs[-1].configs) - search.pending} of {len(search.rungs[-1].configs)} runs finished" \
+                 f"\nClustered {search.clustered_points} points instead of {search.full_grid_points()} " \
+                 f"for the full grid ({saved:.0%} saved)"
+        if search.best_run_id is not None:
+            config = self.presenter.get_algo_run_results(search.best_run_id).config.algo_config
+            score = self.presenter.get_algo_run_results(search.best_run_id).scores[self.score_name]
+            status += f"\nBest: {config.name}, {self.score_name} = {score:.4f} (double click to show)"
+        self.statuses[dataset_id].setText(status)
+
+    def __run_finished(self, dataset_id: uuid, ind: int, rung: int, score):
+        table = self.tables[dataset_id]
+        table.setSortingEnabled(False)
+        row = next(row for row in range(table.rowCount()) if table.item(row, 0).data(Qt.UserRole) == ind)
+        item = table.item(row, rung + 1)
+        item.set_score(score)
+        sign = 1 if self.greater_is_better else -1
+        # Configurations promoted further are above the others, then configurations with better scores
+        sort_key = (rung, -math.inf if score is None or math.isnan(score) else sign * score)
+        for column in range(1, table.columnCount()):
+            table.item(row, column).setData(Qt.UserRole, sort_key)
+        table.setSortingEnabled(True)
+        table.sortItems(1, Qt.DescendingOrder)
+        self.__update_status(dataset_id)
+
+    def get_algo_run_id(self, item: QTableWidgetItem) -> uuid:
+        # Only results of the best run are kept in the model
+        for dataset_id, table in self.tables.items():
+            search = self.searches[dataset_id]
+            if table is item.tableWidget() and search.best_run_id is not None \
+                    and search.run_ids.get(item.data(Qt.UserRole)) == search.best_run_id:
+                return search.best_run_id
+        return None
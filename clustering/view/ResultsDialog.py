@@ -0,0 +1,68 @@
+import uuid
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QDialog, QTableWidgetItem, QVBoxLayout
+
+from clustering.model.Score import ScoreEstimate
+from clustering.presenter.Presenter import Presenter
+from clustering.view.AlgoResultsTab.AlgoResultsTab import AlgoResultsTab
+from clustering.view.WidgetHelper import WidgetHelper
+
+
+class NumericItem(QTableWidgetItem):
+    def __lt__(self, other: QTableWidgetItem):
+        lhs, rhs = self.data(Qt.UserRole), other.data(Qt.UserRole)
+        if rhs is None:
+            return False
+        if lhs is None:
+            return True
+        return lhs < rhs
+
+    def set_score(self, score):
+        """
+        Shows the score, estimated scores are marked with their confidence interval in the tooltip.
+        Items are sorted by the score.
+        """
+        if isinstance(score, ScoreEstimate):
+            self.setText('≈ {:.4f}'.format(score))
+            self.setToolTip('Estimated on subsamples, 95% CI: [{:.4f}, {:.4f}]'.format(score.low, score.high))
+        else:
+            self.setText('None' if score is None else '{:.4f}'.format(score))
+        self.setData(Qt.UserRole, score)
+
+
+class ResultsDialog(QDialog, WidgetHelper):
+    """
+    Base class of dialogs, that show scores of the runs launched by them. Double click on the name of the run
+    opens its results, closing the dialog cancels the runs, that are not finished yet.
+    """
+
+    def __init__(self, presenter: Presenter):
+        super().__init__()
+        self.presenter = presenter
+        self.closed = False
+        # Launched jobs (anything with `cancel` method), subclasses add them here
+        self.jobs = []
+
+    def get_algo_run_id(self, item: QTableWidgetItem) -> uuid:
+        """
+        :return: id of the run, whose results are opened by double click on the item in the first column,
+        or None if they can't be opened
+        """
+        return item.data(Qt.UserRole)
+
+    def show_algo_run(self, item: QTableWidgetItem):
+        if item.column() != 0:
+            return
+        algo_run_id = self.get_algo_run_id(item)
+        if algo_run_id is not None:
+            dialog = QDialog()
+            dialog.setLayout(QVBoxLayout())
+            dialog.layout().addWidget(AlgoResultsTab(self.presenter, algo_run_id))
+            dialog.exec()
+
+    def done(self, result: int):
+        self.closed = True
+        for job in self.jobs:
+            job.cancel()
+        super().done(result)
@@ -0,0 +1,127 @@
+import uuid
+
+from PyQt5.QtWidgets import QDialog, QFormLayout, QWidget, QLineEdit, QSizePolicy, QSpinBox, QCheckBox, \
+    QMessageBox, QHBoxLayout
+
+from clustering.model.Sweep import SweepConfig, param_kinds, parse_param_values
+from clustering.presenter.Presenter import Presenter
+from clustering.view.AddAlgoRunDialog import AlgoSelector
+from clustering.view.WidgetHelper import WidgetHelper
+
+
+class ParamValuesEditor(QWidget):
+    """
+    Line with values for each parameter of the algorithm, parameters with empty lines are not specified.
+    """
+
+    def __init__(self, kinds: dict):
+        super().__init__()
+        self.kinds = kinds
+        self.editors: dict[str, QLineEdit] = {}
+        layout = QFormLayout()
+        for name, (kind, items) in kinds.items():
+            editor = QLineEdit()
+            if kind == str:
+                editor.setPlaceholderText(', '.join(items))
+            elif kind == bool:
+                editor.setPlaceholderText('true, false')
+            else:
+                editor.setPlaceholderText('e.g. 2:10:2, 20')
+            self.editors[name] = editor
+            layout.addRow(name, editor)
+        self.setLayout(layout)
+
+    def get_values(self) -> dict[str, list]:
+        """
+        :raise ValueError: if values of some parameter can't be parsed
+        """
+        values = {}
+        for name, editor in self.editors.items():
+            kind, items = self.kinds[name]
+            try:
+                parsed = parse_param_values(editor.text(), kind, items)
+            except ValueError as err:
+                raise ValueError(f"Wrong values of {name}: {err}")
+            if parsed:
+                values[name] = parsed
+        return values
+
+
+class SweepDialog(QDialog, WidgetHelper):
+    def __init__(self, parent: QWidget, presenter: Presenter, algo_ids: [uuid], title: str = "Parameter sweep",
+                 early_stopping: bool = True):
+        """
+        :param early_stopping: whether the sweep may be stopped, when the best score has plateaued
+        """
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setSizePolicy(QSizePolicy(QSizePolicy.Minimum, QSizePolicy.Minimum))
+        self.setMinimumSize(600, 0)
+        self.presenter = presenter
+        self.result = None
+
+        self.name_input = QLineEdit("")
+        self.algo_selector = AlgoSelector(presenter, algo_ids)
+        self.algo_selector.currentIndexChanged.connect(self.change_cur_algo_listener)
+        self.values_editor = ParamValuesEditor(param_kinds(presenter.get_algo_params(self.algo_selector.currentData())))
+        self.values_titled_editor = self.add_title_to_widget("Values of parameters", self.values_editor)
+
+        self.sample_checkbox, self.n_samples_input = self.__create_optional_number("Sample randomly", 20)
+        self.stop_checkbox, self.patience_input = self.__create_optional_number("Stop, if the best score hasn't "
+                                                                                "improved for (runs)", 10)
+
+        self.layout = QFormLayout()
+        self.layout.addWidget(self.add_title_to_widget("Name", self.name_input))
+        self.layout.addWidget(self.add_title_to_widget("Algorithm", self.algo_selector))
+        self.layout.addWidget(self.values_titled_editor)
+        self.layout.addWidget(self.__to_row(self.sample_checkbox, self.n_samples_input))
+        if early_stopping:
+            self.layout.addWidget(self.__to_row(self.stop_checkbox, self.patience_input))
+        self.layout.addWidget(self.create_button_box())
+        self.setLayout(self.layout)
+
+    @staticmethod
+    def __create_optional_number(title: str, value: int):
+        checkbox = QCheckBox(title)
+        spin_box = QSpinBox()
+        spin_box.setRange(1, 10 ** 6)
+        spin_box.setValue(value)
+        spin_box.setEnabled(False)
+        checkbox.stateChanged.connect(spin_box.setEnabled)
+        return checkbox, spin_box
+
+    @staticmethod
+    def __to_row(*widgets: QWidget):
+        row = QWidget()
+        layout = QHBoxLayout()
+        for widget in widgets:
+            layout.addWidget(widget)
+        row.setLayout(layout)
+        return row
+
+    def change_cur_algo_listener(self, index: int):
+        params = self.presenter.get_algo_params(self.algo_selector.itemData(index))
+        new_values_editor = ParamValuesEditor(param_kinds(params))
+        new_values_titled_editor = self.add_title_to_widget("Values of parameters", new_values_editor)
+        self.layout.replaceWidget(self.values_titled_editor, new_values_titled_editor)
+        self.values_editor.close()
+        self.values_titled_editor.close()
+        self.values_editor = new_values_editor
+        self.values_titled_editor = new_values_titled_editor
+
+    def accept(self):
+        try:
+            self.result = SweepConfig(
+                name=self.name_input.text() or self.algo_selector.currentText(),
+                algo_id=self.algo_selector.currentData(),
+                values=self.values_editor.get_values(),
+                n_samples=self.n_samples_input.value() if self.sample_checkbox.isChecked() else None,
+                patience=self.patience_input.value() if self.stop_checkbox.isChecked() else None
+            )
+        except ValueError as err:
+            QMessageBox.warning(self, "Error", str(err))
+            return
+        super().accept()
+
+    def get_result(self) -> SweepConfig:
+        return self.result
@@ -0,0 +1,139 @@
+import math
+import uuid
+from functools import partial
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QTableWidget, QVBoxLayout, QTableWidgetItem, QAbstractItemView, QLabel, QWidget
+
+from clustering.model.Model import AlgoConfig
+from clustering.model.Sweep import EarlyStopping, SweepConfig
+from clustering.presenter.Presenter import Presenter
+from clustering.view.ResultsDialog import NumericItem, ResultsDialog
+
+
+class _DatasetSweep:
+    """
+    State of the sweep on one dataset. Only results of the best run are kept in the model.
+    """
+
+    def __init__(self, table: QTableWidget, status: QLabel, early_stopping: EarlyStopping = None):
+        self.table = table
+        self.status = status
+        self.early_stopping = early_stopping
+        self.jobs = []
+        self.finished = 0
+        self.stopped = False
+        self.best_run_id = None
+        self.best_score = None
+
+
+class SweepResultsDialog(ResultsDialog):
+    def __init__(self, presenter: Presenter, dataset_ids: [uuid], sweep: SweepConfig, score_id: uuid):
+        super().__init__(presenter)
+        self.setWindowTitle(f"Sweep: {sweep.name}")
+        self.setMinimumSize(800, 600)
+        self.score_name = presenter.get_score_name(score_id)
+        self.greater_is_better = presenter.is_score_greater_better(score_id)
+
+        self.algo_configs, jobs = presenter.launch_sweep(list(dataset_ids), sweep, score_id)
+        self.sweeps: dict[uuid, _DatasetSweep] = {}
+        layout = QVBoxLayout()
+        for dataset_id in dataset_ids:
+            widget = QWidget()
+            widget.setLayout(QVBoxLayout())
+            status = QLabel()
+            table = self.__generate_table()
+            widget.layout().addWidget(status)
+            widget.layout().addWidget(table)
+            layout.addWidget(self.add_title_to_widget(presenter.get_dataset_name(dataset_id), widget))
+            early_stopping = None if sweep.patience is None \
+                else EarlyStopping(sweep.patience, self.greater_is_better, sweep.tolerance)
+            self.sweeps[dataset_id] = _DatasetSweep(table, status, early_stopping)
+            self.__update_status(self.sweeps[dataset_id])
+        self.setLayout(layout)
+
+        self.jobs.extend(jobs.values())
+        for (dataset_id, ind), job in jobs.items():
+            self.sweeps[dataset_id].jobs.append(job)
+            job.finished.connect(partial(self.__run_finished, self.sweeps[dataset_id], self.algo_configs[ind]))
+            job.failed.connect(partial(self.__run_failed, self.sweeps[dataset_id], self.algo_configs[ind]))
+
+    def __generate_table(self):
+        table = QTableWidget(0, 2)
+        table.setHorizontalHeaderItem(0, QTableWidgetItem('Configuration'))
+        table.setHorizontalHeaderItem(1, QTableWidgetItem(f'Score ({self.score_name}):'))
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.itemDoubleClicked.connect(self.show_algo_run)
+        return table
+
+    def __update_status(self, sweep: _DatasetSweep):
+        status = f"Finished {sweep.finished} of {len(self.algo_configs)} runs"
+        if sweep.stopped:
+            status += " (stopped early: the best score has plateaued)"
+        if sweep.best_run_id is not None:
+            config = self.presenter.get_algo_run_results(sweep.best_run_id).config.algo_config
+            status += f"\nBest: {config.name}, {self.score_name} = {sweep.best_score:.4f}"
+        sweep.status.setText(status)
+
+    def __is_better(self, score, best) -> bool:
+        if score is None or math.isnan(score):
+            return False
+        return best is None or (score > best if self.greater_is_better else score < best)
+
+    def __add_row(self, sweep: _DatasetSweep, algo_config: AlgoConfig, score, algo_run_id: uuid = None):
+        """
+        :param algo_run_id: id of the run, which can be opened by double click on the row
+        """
+        table = sweep.table
+        table.setSortingEnabled(False)
+        row = table.rowCount()
+        table.insertRow(row)
+        name_item = QTableWidgetItem(algo_config.name)
+        name_item.setData(Qt.UserRole, algo_run_id)
+        score_item = NumericItem()
+        score_item.set_score(score)
+        table.setItem(row, 0, name_item)
+        table.setItem(row, 1, score_item)
+        table.setSortingEnabled(True)
+        table.sortItems(1, Qt.DescendingOrder if self.greater_is_better else Qt.AscendingOrder)
+
+    def __run_finished(self, sweep: _DatasetSweep, algo_config: AlgoConfig, algo_run_id: uuid):
+        if self.closed:
+            self.presenter.discard_algo_run(algo_run_id)
+            return
+        score = self.presenter.get_algo_run_results(algo_run_id).scores[self.score_name]
+        sweep.finished += 1
+        if self.__is_better(score, sweep.best_score):
+            if sweep.best_run_id is not None:
+                self.__forget_best(sweep)
+            sweep.best_run_id, sweep.best_score = algo_run_id, score
+            self.__add_row(sweep, algo_config, score, algo_run_id)
+        else:
+            self.presenter.discard_algo_run(algo_run_id)
+            self.__add_row(sweep, algo_config, score)
+        self.__check_early_stopping(sweep, score)
+        self.__update_status(sweep)
+
+    @staticmethod
+    def __check_early_stopping(sweep: _DatasetSweep, score):
+        if sweep.early_stopping is not None and not sweep.stopped and sweep.early_stopping.update(score):
+            sweep.stopped = True
+            # Runs, that have already started, are finished anyway
+            for job in sweep.jobs:
+                job.cancel()
+
+    def __forget_best(self, sweep: _DatasetSweep):
+        # Results of the previous best run are removed, so its row can't be opened anymore
+        for row in range(sweep.table.rowCount()):
+            item = sweep.table.item(row, 0)
+            if item.data(Qt.UserRole) == sweep.best_run_id:
+                item.setData(Qt.UserRole, None)
+        self.presenter.discard_algo_run(sweep.best_run_id)
+
+    def __run_failed(self, sweep: _DatasetSweep, algo_config: AlgoConfig, msg: str):
+        if self.closed or sweep.stopped:
+            return
+        sweep.finished += 1
+        self.__add_row(sweep, algo_config, None)
+        self.__check_early_stopping(sweep, None)
+        self.__update_status(sweep)
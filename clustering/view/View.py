@@ -1,7 +1,9 @@
 import uuid
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 
-from PyQt5.QtWidgets import QMainWindow, QAction, QFileDialog, QErrorMessage, QMessageBox
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QMainWindow, QAction, QFileDialog, QErrorMessage, QMessageBox, QProgressDialog, \
+    QApplication
 
 from clustering.model.Model import Model, AlgoRunConfig, AppMode, AlgoConfig
 from clustering.view.AddDatasetDialog import AddDatasetDialog
@@ -40,6 +42,26 @@ class View(QMainWindow):
     def show_information(self, msg: str):
         QMessageBox.information(self, "Info", msg)
 
+    def show_progress(self, label: str, total: int, steps: Iterator[int]) -> bool:
+        """
+        Performs steps while showing their progress, each step yields the number of completed units of work.
+
+        :return: False if it was cancelled by user, otherwise True
+        """
+        progress = QProgressDialog(label, "Cancel", 0, total, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        try:
+            for done in steps:
+                progress.setValue(done)
+                QApplication.processEvents()
+                if progress.wasCanceled():
+                    return False
+            return True
+        finally:
+            steps.close()
+            progress.close()
+
     def load_from_model(self, model: Model):
         if self.central_widget is not None:
             self.central_widget.close()
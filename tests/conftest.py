@@ -0,0 +1,17 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+CLUSTERING_DIR = os.path.join(os.path.dirname(__file__), '..', 'clustering')
+
+
+@pytest.fixture
+def app_dir(tmp_path: Path) -> Path:
+    """
+    Temporary working directory with the algorithms of the app (the app is run from clustering/ and uses relative
+    paths).
+    """
+    shutil.copytree(os.path.join(CLUSTERING_DIR, 'algorithms'), tmp_path / 'algorithms')
+    return tmp_path
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import sklearn.cluster as sk
+from sklearn.datasets import make_blobs
+from sklearn.metrics import adjusted_rand_score
+
+from clustering.algorithms.default_algorithms import agglomerative, dbscan
+from clustering.metrics.default_metrics import get_metric
+from clustering.model.DistanceMatrix import distances
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_dir(tmp_path, monkeypatch):
+    # Intermediate results are cached in ./cache
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize('metric', ['euclidean', 'manhattan', 'cosine'])
+@pytest.mark.parametrize('algorithm', ['auto', 'brute'])
+# Distance matrix is stored only for the larger dataset, brute force on the smaller one is done by blocks
+@pytest.mark.parametrize('n_samples', [1500, 2500])
+def test_dbscan_matches_sklearn(metric: str, algorithm: str, n_samples: int):
+    data, _ = make_blobs(n_samples, centers=5, cluster_std=1.5, random_state=0)
+    eps_values = [0.001, 0.003] if metric == 'cosine' else [0.4, 0.6, 1.0]
+    # Larger eps goes last, so the cached neighbour graph is both reused and rebuilt
+    for eps in eps_values:
+        for min_samples in [3, 5, 20]:
+            params = {'eps': eps, 'min_samples': min_samples, 'metric': metric, 'algorithm': algorithm}
+            expected = sk.DBSCAN(**params).fit(data).labels_
+            np.testing.assert_array_equal(dbscan.run(data, params), expected)
+
+
+@pytest.mark.parametrize('affinity', ['euclidean', 'manhattan', 'cosine'])
+@pytest.mark.parametrize('linkage', ['complete', 'average', 'single'])
+def test_agglomerative_matches_sklearn(affinity: str, linkage: str):
+    # Enough points for the distance matrix to be stored
+    data, _ = make_blobs(2500, centers=5, cluster_std=1.5, random_state=0)
+    # Stored float32 distances may break near ties differently from float64 ones, so sklearn gets the same distances
+    matrix = None if linkage == 'single' else np.asarray(distances.get(data, get_metric(affinity)))
+    for n_clusters in [2, 5, 10]:
+        params = {'n_clusters': n_clusters, 'affinity': affinity, 'linkage': linkage}
+        if matrix is None:
+            expected = sk.AgglomerativeClustering(**params).fit(data).labels_
+        else:
+            expected = sk.AgglomerativeClustering(**dict(params, affinity='precomputed')).fit(matrix).labels_
+        assert adjusted_rand_score(agglomerative.run(data, params), expected) == 1.0
@@ -0,0 +1,159 @@
+import os
+import pickle
+import time
+from collections.abc import Callable
+
+import numpy as np
+import pytest
+from PyQt5.QtCore import QCoreApplication
+from sklearn.datasets import make_blobs
+
+from clustering.model.Algorithm import load_algorithms
+from clustering.model.Dataset import Dataset, add_dataset, load_all_datasets
+from clustering.model.HalvingSearch import HalvingSearch
+from clustering.model.Model import AlgoConfig, AlgoRunConfig, AppMode, Model, run_algo
+from clustering.model.ResultCache import ResultCache
+from clustering.scores.default_scores import scores
+
+
+@pytest.fixture
+def model(app_dir, monkeypatch) -> Model:
+    """
+    Model with one dataset, that works in `app_dir`
+    """
+    monkeypatch.chdir(app_dir)
+    data, target = make_blobs(300, centers=3, random_state=0)
+    model = Model([Dataset(data, target=target, name='blobs')], load_algorithms(), scores,
+                  result_cache=ResultCache('cache'))
+    yield model
+    model.shutdown()
+
+
+def get_run_args(model: Model, algo_name: str, params: dict) -> tuple:
+    """
+    :return: arguments of `run_algo`, that are sent to worker processes in compare mode
+    """
+    algo_id = next(algo_id for algo_id, algorithm in model.algorithms.items() if algorithm.name == algo_name)
+    config = AlgoRunConfig(algo_config=AlgoConfig(name=algo_name, algo_id=algo_id, params=params),
+                           dataset_id=next(iter(model.datasets)), score_ids=list(model.scores))
+    return model._Model__get_run_args(config)
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 120):
+    """
+    Processes events of the jobs until the condition is true
+    """
+    app = QCoreApplication.instance() or QCoreApplication([])
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_run_args_are_picklable(model: Model):
+    args = get_run_args(model, "K-means", {'n_clusters': 3, 'random_state': 0})
+    pred, _, _ = run_algo(*pickle.loads(pickle.dumps(args)))
+    assert len(np.unique(pred)) == 3
+
+
+def test_run_in_process_pool(model: Model):
+    algo_id = next(algo_id for algo_id, algorithm in model.algorithms.items() if algorithm.name == "K-means")
+    jobs = model.submit_algo_matrix(list(model.datasets), [AlgoConfig('K-means', algo_id, {'n_clusters': 3})],
+                                    list(model.scores))
+    job = next(iter(jobs.values()))
+    results = []
+    job.finished.connect(results.append)
+    job.failed.connect(results.append)
+    wait_for(lambda: bool(results))
+    algo_run = model.algo_run_results[results[0]]
+    assert algo_run.pred.shape == (300,)
+    assert set(algo_run.scores) == {score.name for score in scores}
+    # Runs of the matrix are never rerun, so their estimators are not sent back
+    assert algo_run.estimator is None
+
+
+def test_rerun_keeps_estimator(model: Model):
+    algo_id = next(algo_id for algo_id, algorithm in model.algorithms.items() if algorithm.name == "K-means")
+    config = AlgoRunConfig(algo_config=AlgoConfig('K-means', algo_id, {'n_clusters': 3}),
+                           dataset_id=next(iter(model.datasets)), score_ids=list(model.scores))
+    results = []
+    job = model.submit_algo_run(config)
+    job.finished.connect(results.append)
+    job.failed.connect(results.append)
+    wait_for(lambda: bool(results))
+    assert model.algo_run_results[results[0]].estimator.cluster_centers_.shape == (3, 2)
+
+
+def saved_session(model: Model, n_runs: int) -> [str]:
+    """
+    :return: names of the prediction files of saved runs
+    """
+    model.mode = AppMode.ResearchMode
+    for _ in range(n_runs):
+        config = run_config(model)
+        model._Model__add_results(config, np.zeros(300, dtype=np.int64), {})
+    model.save()
+    return sorted(os.listdir('__last_run_runs'))
+
+
+def run_config(model: Model) -> AlgoRunConfig:
+    algo_id = next(iter(model.algorithms))
+    return AlgoRunConfig(algo_config=AlgoConfig(name='config', algo_id=algo_id, params={}),
+                         dataset_id=next(iter(model.datasets)), score_ids=[])
+
+
+def test_load_skips_runs_with_damaged_predictions(model: Model):
+    pred_files = saved_session(model, 3)
+    os.remove(os.path.join('__last_run_runs', pred_files[0]))
+    with open(os.path.join('__last_run_runs', pred_files[1]), 'r+b') as pred_file:
+        pred_file.truncate(10)
+    assert model.load_from_file()
+    assert model.mode == AppMode.ResearchMode
+    assert [f"{algo_run_id}.npz" for algo_run_id in model.algo_run_results] == pred_files[2:]
+
+
+@pytest.mark.parametrize('content', ['{"mode": "ResearchMode", "algo_ru', '[]', '{"mode": "Unknown"}'])
+def test_load_skips_damaged_session(model: Model, content: str):
+    saved_session(model, 1)
+    with open('__last_run.json', 'w') as session_file:
+        session_file.write(content)
+    assert not model.load_from_file()
+    assert model.mode is None and not model.algo_run_results
+
+
+def test_dataset_is_released_with_its_last_run(model: Model):
+    os.makedirs('datasets')
+    with open(os.path.join('datasets', 'datasets.json'), 'w') as json_file:
+        json_file.write('[]')
+    add_dataset(Dataset(np.zeros((300, 2)), name='stored'))
+    stored = load_all_datasets()[0]
+    dataset_id = model.add_dataset(stored)
+    config = AlgoRunConfig(algo_config=AlgoConfig(name='config', algo_id=next(iter(model.algorithms)), params={}),
+                           dataset_id=dataset_id, score_ids=[])
+    run_ids = [model._Model__add_results(config, np.zeros(300, dtype=np.int64), {}) for _ in range(2)]
+    assert stored.data is not None
+    model.remove_algo_run_results(run_ids[0])
+    assert stored._data is not None
+    model.remove_algo_run_results(run_ids[1])
+    assert stored._data is None
+    assert stored.data.shape == (300, 2)
+
+
+@pytest.mark.parametrize('reported', [False, True])
+def test_cancelled_halving_search_leaves_no_runs(model: Model, reported: bool):
+    algo_id = next(algo_id for algo_id, algorithm in model.algorithms.items() if algorithm.name == "K-means")
+    configs = [AlgoConfig(f'{n_clusters} clusters', algo_id, {'n_clusters': n_clusters, 'n_init': 1})
+               for n_clusters in (2, 3, 4)]
+    # The only rung runs on the whole dataset, so its runs are added to the model
+    search = HalvingSearch(model, next(iter(model.datasets)), configs, next(iter(model.scores)))
+    # Cancelled right in the slot, because several results may be delivered by one processing of events
+    if reported:
+        search.finished.connect(lambda _: search.cancel())
+    else:
+        search.evaluated.connect(lambda *_: search.cancel())
+    search.start()
+    wait_for(lambda: search.cancelled and all(job.future.done() for job in search.jobs))
+    wait_for(lambda: False, timeout=0.5)
+    # The best run is kept only if it was reported before cancelling
+    assert (search.best_run_id is not None) == reported
+    assert list(model.algo_run_results) == ([search.best_run_id] if reported else [])
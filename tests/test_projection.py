@@ -0,0 +1,19 @@
+import numpy as np
+from sklearn.datasets import make_blobs
+from sklearn.decomposition import PCA
+
+from clustering.model import Projection
+from clustering.model.Dataset import Dataset
+from clustering.model.Projection import ProjectionMethod, calc_projection
+
+
+def test_large_data_is_projected_by_chunks(monkeypatch):
+    data, _ = make_blobs(1001, n_features=5, centers=3, random_state=0)
+    monkeypatch.setattr(Projection, 'INCREMENTAL_DATA_SIZE', 0)
+    monkeypatch.setattr(Projection, 'INCREMENTAL_CHUNK_SIZE', 100)
+    points = calc_projection(Dataset(data, name='blobs'), ProjectionMethod.PCA)
+    expected = PCA(n_components=2).fit_transform(data)
+    assert points.shape == (1001, 2)
+    # Components are defined up to their signs
+    for component in range(2):
+        assert np.allclose(np.abs(points[:, component]), np.abs(expected[:, component]), atol=1e-2 * np.ptp(expected))
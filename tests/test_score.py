@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_blobs
+from sklearn import metrics
+
+from clustering.model import Score as score_module
+from clustering.model.Score import ScoreContext, stratified_subsample
+from clustering.scores import default_scores
+
+
+@pytest.mark.parametrize('n_clusters, size', [(5, 5792), (4000, 5792), (50000, 5792), (10, 10)])
+def test_stratified_subsample_size(n_clusters: int, size: int):
+    rng = np.random.default_rng(0)
+    cluster_idx = np.unique(rng.integers(0, n_clusters, 200000), return_inverse=True)[1]
+    idx = stratified_subsample(cluster_idx, size, rng)
+    assert len(idx) == size
+    assert len(np.unique(idx)) == size
+    sizes = np.bincount(cluster_idx)
+    sampled = np.bincount(cluster_idx[idx], minlength=len(sizes))
+    if n_clusters <= size:
+        assert (sampled > 0).all()
+    # Each cluster is represented proportionally up to rounding
+    assert np.abs(sampled - size * sizes / len(cluster_idx)).max() < 2
+
+
+def test_stratified_subsample_of_small_data():
+    idx = stratified_subsample(np.array([0, 0, 1, 2, 2]), 100, np.random.default_rng(0))
+    np.testing.assert_array_equal(idx, np.arange(5))
+
+
+def test_calinski_harabasz_by_chunks(monkeypatch):
+    # Chunks don't divide the number of points, and there are labels of noise
+    monkeypatch.setattr(score_module, 'INCREMENTAL_CHUNK_SIZE', 100)
+    monkeypatch.setattr(default_scores, 'INCREMENTAL_CHUNK_SIZE', 100)
+    data, pred = make_blobs(1003, centers=4, random_state=0)
+    pred[::10] = -1
+    score = next(score for score in default_scores.scores if score.name == "Calinski-Harabasz")
+    assert score.calc_score(ScoreContext(data, None, pred)) == pytest.approx(metrics.calinski_harabasz_score(data, pred))
+
+
+def random_labels(n_labels: int, with_noise: bool) -> (np.ndarray, np.ndarray):
+    rng = np.random.default_rng(n_labels)
+    target, pred = rng.integers(0, n_labels, (2, 500))
+    if with_noise:
+        pred[::7] = -1
+    return target, pred
+
+
+@pytest.mark.parametrize('name, expected_fun', [
+    ("Rand", metrics.rand_score),
+    ("Adjusted rand", metrics.adjusted_rand_score),
+    ("Fowlkes-Mallows", metrics.fowlkes_mallows_score),
+    ("Completeness", metrics.completeness_score)
+])
+@pytest.mark.parametrize('target, pred', [
+    random_labels(3, with_noise=False),
+    random_labels(10, with_noise=True),
+    # One cluster
+    (np.arange(100) % 3, np.zeros(100, dtype=np.int64)),
+    (np.zeros(100, dtype=np.int64), np.zeros(100, dtype=np.int64)),
+    # Each point is its own cluster
+    (np.arange(100) % 3, np.arange(100)),
+    (np.arange(100), np.arange(100)),
+])
+def test_contingency_scores_match_sklearn(name: str, expected_fun, target: np.ndarray, pred: np.ndarray):
+    score = next(score for score in default_scores.scores if score.name == name)
+    assert score.calc_score(ScoreContext(None, target, pred)) == pytest.approx(expected_fun(target, pred))
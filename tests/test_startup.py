@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Heavy libraries are imported only when the first algorithm, score or dataset needs them
+HEAVY_MODULES = ['sklearn', 'scipy', 'pandas']
+# Importing the app and discovering its algorithms took about 1.8 s with heavy imports and 0.26 s without them
+STARTUP_TIME_BUDGET = 1.0
+
+STARTUP_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from clustering.model.Algorithm import load_algorithms
+from clustering.model.Model import Model
+from clustering.presenter.Presenter import Presenter
+from clustering.scores.default_scores import scores
+from clustering.view.View import View
+load_algorithms()
+print(json.dumps({'time': time.perf_counter() - start, 'modules': sorted(sys.modules)}))
+"""
+
+
+def test_startup_doesnt_import_heavy_modules(app_dir):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, QT_QPA_PLATFORM='offscreen')
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=app_dir, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    startup = json.loads(output.splitlines()[-1])
+    imported = {module.split('.')[0] for module in startup['modules']}
+    assert imported.isdisjoint(HEAVY_MODULES)
+    assert startup['time'] < STARTUP_TIME_BUDGET